@@ -156,7 +156,7 @@ class PnlAdmin(FullPermissionModelAdmin):
         """)
     
 class ExecutorAdmin(FullPermissionModelAdmin):
-    w3 = Web3(Web3.HTTPProvider(os.environ.get('HTTPS_URL')))
+    w3 = Web3(Web3.HTTPProvider(os.environ.get('HTTPS_URL').split(',')[0]))
 
     list_filter = ['is_deleted']
     list_display = ('id', 'address', 'initial_balance_h', 'current_balance', 'pnl', 'created_at', 'buttons')
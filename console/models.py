@@ -169,7 +169,7 @@ class Executor(models.Model):
     class Meta():
         db_table = "executor"
 
-    w3 = Web3(Web3.HTTPProvider(os.environ.get('HTTPS_URL')))
+    w3 = Web3(Web3.HTTPProvider(os.environ.get('HTTPS_URL').split(',')[0]))
 
     id = models.BigAutoField(primary_key=True)
     address = models.CharField(max_length=42, unique=True)
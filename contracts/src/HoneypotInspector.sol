@@ -0,0 +1,88 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.13;
+
+import "./interfaces/IUniswapV2Router02.sol";
+import "./interfaces/IERC20.sol";
+
+// Never deployed: the runtime code is injected through an eth_call state override,
+// so everything it needs comes from calldata and it keeps no storage.
+contract HoneypotInspector {
+  struct Result {
+    uint256 amountIn;
+    uint256 amountTokenExpected;
+    uint256 amountToken;
+    uint256 amountOutExpected;
+    uint256 amountOut;
+    uint256 buyGas;
+    uint256 sellGas;
+  }
+
+  fallback() external payable {}
+
+  receive() external payable {}
+
+  function inspect(address router, address weth, address erc20) external payable returns (Result memory result) {
+    return _inspect(router, weth, erc20, msg.value);
+  }
+
+  // msg.value is split evenly, a reverting token only fails its own entry
+  function inspectBatch(address router, address weth, address[] calldata erc20s) external payable returns (bool[] memory success, Result[] memory results) {
+    require(erc20s.length > 0, "Empty batch");
+
+    uint256 amountIn = msg.value / erc20s.length;
+    success = new bool[](erc20s.length);
+    results = new Result[](erc20s.length);
+
+    for (uint256 i = 0; i < erc20s.length; i++) {
+      try this.inspectToken(router, weth, erc20s[i], amountIn) returns (Result memory result) {
+        success[i] = true;
+        results[i] = result;
+      } catch {
+        success[i] = false;
+      }
+    }
+  }
+
+  function inspectToken(address router, address weth, address erc20, uint256 amountIn) external returns (Result memory result) {
+    require(msg.sender == address(this), "Unauthorized");
+    return _inspect(router, weth, erc20, amountIn);
+  }
+
+  function _inspect(address router, address weth, address erc20, uint256 amountIn) internal returns (Result memory result) {
+    address[] memory path = new address[](2);
+    path[0] = weth;
+    path[1] = erc20;
+
+    // buy
+    result.amountIn = amountIn;
+    result.amountTokenExpected = IUniswapV2Router02(router).getAmountsOut(amountIn, path)[1];
+
+    uint256 gasBefore = gasleft();
+    IUniswapV2Router02(router).swapExactETHForTokensSupportingFeeOnTransferTokens{value: amountIn}(
+      0,
+      path,
+      address(this),
+      block.timestamp
+    );
+    result.buyGas = gasBefore - gasleft();
+    result.amountToken = IERC20(erc20).balanceOf(address(this));
+
+    // sell everything received
+    path[0] = erc20;
+    path[1] = weth;
+    result.amountOutExpected = IUniswapV2Router02(router).getAmountsOut(result.amountToken, path)[1];
+    IERC20(erc20).approve(router, result.amountToken);
+
+    uint256 balanceBefore = address(this).balance;
+    gasBefore = gasleft();
+    IUniswapV2Router02(router).swapExactTokensForETHSupportingFeeOnTransferTokens(
+      result.amountToken,
+      0,
+      path,
+      address(this),
+      block.timestamp
+    );
+    result.sellGas = gasBefore - gasleft();
+    result.amountOut = address(this).balance - balanceBefore;
+  }
+}
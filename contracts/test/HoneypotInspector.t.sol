@@ -0,0 +1,63 @@
+// SPDX-License-Identifier: UNLICENSED
+pragma solidity ^0.8.13;
+
+import "forge-std/Test.sol";
+
+import {HelperContract} from "./HelperContract.sol";
+import {BootstrapBot} from "../src/BootstrapBot.sol";
+import {ERC20Token} from "../src/ERC20Token.sol";
+import {HoneypotInspector} from "../src/HoneypotInspector.sol";
+
+contract HoneypotInspectorTest is Test, HelperContract {
+  uint256 private constant INSPECT_VALUE = 10**15;
+
+  BootstrapBot public bootstrapBot;
+  HoneypotInspector public inspector;
+
+  function setUp() public {
+    token = new ERC20Token();
+    bootstrapBot = new BootstrapBot(ROUTERV2, FACTORYV2, WETH);
+
+    token.transfer(address(bootstrapBot), TOTAL_SUPPLY/2);
+    bootstrapBot.approveToken(ROUTERV2, address(token), TOTAL_SUPPLY/2);
+    bootstrapBot.addLiquidity{value: INITIAL_AVAX_RESERVE}(address(token), TOTAL_SUPPLY/2);
+
+    // mirror the eth_call state override used off-chain
+    inspector = HoneypotInspector(payable(address(0xbEEF)));
+    vm.etch(address(inspector), type(HoneypotInspector).runtimeCode);
+  }
+
+  function test_InspectSuccess() public {
+    HoneypotInspector.Result memory result = inspector.inspect{value: INSPECT_VALUE}(ROUTERV2, WETH, address(token));
+
+    assertEq(result.amountIn, INSPECT_VALUE);
+    assertEq(result.amountToken, result.amountTokenExpected);
+    assertEq(result.amountOut, result.amountOutExpected);
+    assertGt(result.amountOut, INSPECT_VALUE*9/10);
+    assertGt(result.buyGas, 0);
+    assertGt(result.sellGas, 0);
+  }
+
+  function test_InspectBatchIsolatesRevertedToken() public {
+    address[] memory erc20s = new address[](2);
+    erc20s[0] = address(1);
+    erc20s[1] = address(token);
+
+    (bool[] memory success, HoneypotInspector.Result[] memory results) = inspector.inspectBatch{value: 2*INSPECT_VALUE}(ROUTERV2, WETH, erc20s);
+
+    assertFalse(success[0]);
+    assertTrue(success[1]);
+    assertEq(results[1].amountIn, INSPECT_VALUE);
+    assertGt(results[1].amountOut, INSPECT_VALUE*9/10);
+  }
+
+  function test_InspectTokenRevertedDueUnauthorized() public {
+    vm.expectRevert();
+    inspector.inspectToken(ROUTERV2, WETH, address(token), INSPECT_VALUE);
+  }
+
+  function test_InspectRevertedDueNoPair() public {
+    vm.expectRevert();
+    inspector.inspect{value: INSPECT_VALUE}(ROUTERV2, WETH, address(1));
+  }
+}
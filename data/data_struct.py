@@ -44,8 +44,33 @@ class BlockData:
         Pairs created {len(self.pairs)} Inventory {len(self.inventory)} Watchlist {len(self.watchlist)}
         """
 
+class PendingPair:
+    def __init__(self, token, creator, amount_token, amount_eth, tx_hash, detected_at=0) -> None:
+        self.token = token
+        self.creator = creator
+        self.amount_token = amount_token
+        self.amount_eth = amount_eth
+        self.tx_hash = tx_hash
+        self.detected_at = detected_at
+
+    def __str__(self) -> str:
+        return f"PendingPair Token {self.token} Creator {self.creator} AmountToken {self.amount_token} AmountEth {self.amount_eth} Tx {self.tx_hash}"
+
+class BlockRecord:
+    def __init__(self, block_number, block_hash, parent_hash, reserve_deltas=None, cache_deltas=None) -> None:
+        self.block_number = block_number
+        self.block_hash = block_hash
+        self.parent_hash = parent_hash
+        # inventory pair -> (reserve_token, reserve_eth) before the block
+        self.reserve_deltas = reserve_deltas if reserve_deltas is not None else {}
+        # cached pair -> (reserve0, reserve1, block_number) before the block, None if the block added it
+        self.cache_deltas = cache_deltas if cache_deltas is not None else {}
+
+    def __str__(self) -> str:
+        return f"BlockRecord #{self.block_number} hash {self.block_hash} parent {self.parent_hash} deltas {len(self.reserve_deltas)} cache deltas {len(self.cache_deltas)}"
+
 class ExecutionOrder:
-    def __init__(self, block_number, block_timestamp, pair: Pair, amount_in, amount_out_min, is_buy, signer=None, bot=None, is_paper=False) -> None:
+    def __init__(self, block_number, block_timestamp, pair: Pair, amount_in, amount_out_min, is_buy, signer=None, bot=None, is_paper=False, buy_amount=None) -> None:
         self.block_number = block_number
         self.block_timestamp = block_timestamp
         self.pair = pair
@@ -55,12 +80,14 @@ class ExecutionOrder:
         self.signer = signer
         self.bot = bot
         self.is_paper = is_paper
+        # eth spent on the position a sell order liquidates
+        self.buy_amount = buy_amount
 
     def __str__(self) -> str:
         return f"ExecutionOrder Block #{self.block_number} Pair {self.pair.address} AmountIn {self.amount_in} AmountOutMin {self.amount_out_min} Signer {self.signer} Bot {self.bot} IsBuy {self.is_buy} IsPaper {self.is_paper}"
     
 class ExecutionAck:
-    def __init__(self, lead_block, block_number, tx_hash, tx_status, pair: Pair, amount_in, amount_out, is_buy, signer=None, bot=None, is_paper=False) -> None:
+    def __init__(self, lead_block, block_number, tx_hash, tx_status, pair: Pair, amount_in, amount_out, is_buy, signer=None, bot=None, is_paper=False, buy_amount=None) -> None:
         self.lead_block = lead_block
         self.block_number = block_number
         self.tx_hash = tx_hash
@@ -72,13 +99,14 @@ class ExecutionAck:
         self.signer = signer
         self.bot = bot
         self.is_paper = is_paper
+        self.buy_amount = buy_amount
 
     def __str__(self) -> str:
         return f"""
         ExecutionAck lead #{self.lead_block} realized #{self.block_number} Tx {self.tx_hash} STATUS {self.tx_status}
         Pair {self.pair.address} AmountIn {self.amount_in} AmountOut {self.amount_out} Signer {self.signer} Bot {self.bot} IsBuy {self.is_buy} IsPaper {self.is_paper}
         """
-from enum import IntEnum
+from enum import IntEnum, IntFlag
 
 class ReportDataType(IntEnum):
     BLOCK = 0
@@ -120,15 +148,33 @@ class W3Account:
         self.bot = bot
 
 class SimulationResult:
-    def __init__(self, pair, amount_in, amount_out, slippage, amount_token=0) -> None:
+    def __init__(self, pair, amount_in, amount_out, slippage, amount_token=0, buy_gas=0, sell_gas=0, buy_tax=0, sell_tax=0, slippage_curve=None, sell_failed_horizon=None, max_buy_amount=None, max_sell_amount=None) -> None:
         self.pair = pair
         self.amount_in = amount_in
         self.amount_out = amount_out
         self.slippage = slippage
         self.amount_token = amount_token
+        self.buy_gas = buy_gas
+        self.sell_gas = sell_gas
+        self.buy_tax = buy_tax
+        self.sell_tax = sell_tax
+        # [(amount_in, slippage)] by ascending amount, slippage is None where the round trip failed
+        self.slippage_curve = slippage_curve if slippage_curve is not None else []
+        # earliest number of blocks ahead at which selling reverts, None if every horizon sold
+        self.sell_failed_horizon = sell_failed_horizon
+        # largest buy and round trip in eth that succeed, None when no limit was hit
+        self.max_buy_amount = max_buy_amount
+        self.max_sell_amount = max_sell_amount
+
+    def slippage_at(self, amount):
+        # the smallest simulated size covering the amount, None when nothing covers it
+        for amount_in, slippage in self.slippage_curve:
+            if amount_in >= amount:
+                return slippage
+        return None
 
     def __str__(self) -> str:
-        return f"Simulation result {self.pair.address} slippage {self.slippage} amountIn {self.amount_in} amountOut {self.amount_out} amountToken {self.amount_token}"
+        return f"Simulation result {self.pair.address} slippage {self.slippage} amountIn {self.amount_in} amountOut {self.amount_out} amountToken {self.amount_token} buyGas {self.buy_gas} sellGas {self.sell_gas} buyTax {self.buy_tax} sellTax {self.sell_tax} slippageCurve {self.slippage_curve} sellFailedHorizon {self.sell_failed_horizon} maxBuyAmount {self.max_buy_amount} maxSellAmount {self.max_sell_amount}"
     
 class FilterLogsType(IntEnum):
     PAIR_CREATED = 0
@@ -158,6 +204,42 @@ class Position:
     def __str__(self) -> str:
         return f"Position {self.pair.address} amount {self.amount} buyPrice {self.buy_price} startTime {self.start_time} signer {self.signer} bot {self.bot} pnl {self.pnl} isPaper {self.is_paper}"
     
+class Inventory:
+    # pairs or positions indexed by pair address, iterated in insertion order
+    def __init__(self, items=None) -> None:
+        self.items = {}
+        for item in (items if items is not None else []):
+            self.add(item)
+
+    @staticmethod
+    def key(item):
+        address = item.pair.address if isinstance(item, Position) else item.address
+        return address.lower()
+
+    def add(self, item):
+        self.items[Inventory.key(item)] = item
+
+    def get(self, address):
+        return self.items.get(address.lower())
+
+    def remove(self, address):
+        return self.items.pop(address.lower(), None)
+
+    def addresses(self):
+        return list(self.items.keys())
+
+    def __contains__(self, address) -> bool:
+        return address.lower() in self.items
+
+    def __iter__(self):
+        return iter(list(self.items.values()))
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __str__(self) -> str:
+        return f"Inventory {len(self.items)} {self.addresses()}"
+
 class TxStatus(IntEnum):
     FAILED = 0
     SUCCESS = 1
@@ -169,6 +251,14 @@ class MaliciousPair(IntEnum):
     UNVERIFIED=3
     MALICIOUS_TX_IN=4
 
+class BytecodeRisk(IntFlag):
+    NONE=0
+    SELFDESTRUCT=1
+    DELEGATECALL_PROXY=2
+    BLACKLIST=4
+    TRANSFER_GATE=8
+    FEE_SETTER=16
+
 class InspectionResult:
     def __init__(self, pair: Pair, from_block, to_block, reserve_inrange=False, simulation_result=None, is_malicious=MaliciousPair.UNMALICIOUS, contract_verified=False, is_creator_call_contract=0, number_tx_mm=0) -> None:
         self.pair = pair
@@ -181,13 +271,19 @@ class InspectionResult:
         self.contract_verified = contract_verified
         self.is_creator_call_contract = is_creator_call_contract
         self.number_tx_mm = number_tx_mm
+        self.bytecode_risk = BytecodeRisk.NONE
+        # largest order in eth the token lets us buy and sell back, None when unlimited
+        self.max_amount_in = None
+        # check name -> seconds, only checks that completed before the pair was settled
+        self.check_latencies = {}
 
     def __str__(self) -> str:
         return f"""
         Inspection result Pair {self.pair.address} fromBlock {self.from_block} toBlock {self.to_block}
         ReserveInrange {self.reserve_inrange} IsMalicious {self.is_malicious} ContractVerified {self.contract_verified}
-        CreatorCallContract {self.is_creator_call_contract} NumberTxMM {self.number_tx_mm}
+        CreatorCallContract {self.is_creator_call_contract} NumberTxMM {self.number_tx_mm} BytecodeRisk {self.bytecode_risk!r} MaxAmountIn {self.max_amount_in}
         SimulationResult {self.simulation_result}
+        CheckLatencies {self.check_latencies}
         """
 
 class BotCreationOrder:
@@ -215,4 +311,26 @@ class ControlOrder:
         self.data = data
 
     def __str__(self) -> str:
-        return f"ControlOrder Type{self.type} Data {self.data}"
\ No newline at end of file
+        return f"ControlOrder Type{self.type} Data {self.data}"
+
+class InspectionOrderType(IntEnum):
+    INSPECT=0
+    PREWARM=1
+    BLACKLIST_ADDED=2
+
+class InspectionOrder:
+    def __init__(self, type: InspectionOrderType, data, order_id=0) -> None:
+        self.type = type
+        self.data = data
+        self.order_id = order_id
+
+    def __str__(self) -> str:
+        return f"InspectionOrder #{self.order_id} Type {self.type} Data {self.data}"
+
+class InspectionAck:
+    def __init__(self, order_id, results) -> None:
+        self.order_id = order_id
+        self.results = results
+
+    def __str__(self) -> str:
+        return f"InspectionAck #{self.order_id} Results {len(self.results)}"
@@ -14,7 +14,7 @@ import console.models
 import sys # for testing
 sys.path.append('..')
 
-from library import Singleton
+from library import Singleton, HedgedHTTPProvider
 from data import W3Account
 
 ALLOWANCE_TOKEN_AMOUNT = 10**6
@@ -22,7 +22,7 @@ MINIMUM_AVAX_BALANCE = 0.01
 
 class BaseExecutor(metaclass=Singleton):
     def __init__(self, http_url, treasury_key, executor_keys, order_receiver, report_sender, gas_limit, max_fee_per_gas, max_priority_fee_per_gas, deadline_delay) -> None:
-        self.w3 = Web3(Web3.HTTPProvider(http_url))
+        self.w3 = Web3(HedgedHTTPProvider(http_url))
         if self.w3.is_connected() == True:
             logging.info(f"web3 provider {http_url} connected")
 
@@ -12,7 +12,7 @@ from web3.middleware import geth_poa_middleware, construct_sign_and_send_raw_mid
 import sys # for testing
 sys.path.append('..')
 
-from library import Singleton
+from library import Singleton, HedgedHTTPProvider
 from helpers import constants, load_abi
 from factory import BotFactory
 
@@ -25,7 +25,7 @@ TREASURY_ADDRESS="0xA0e4075e79aE82E1071B1636b8b9129877D94BfD"
 class Bootstrap(metaclass=Singleton):
     def __init__(self, http_url, manager_key, bot_factory, bot_factory_abi, bot_implementation,
                  router, pair_factory, weth) -> None:
-        self.w3 = Web3(Web3.HTTPProvider(http_url))
+        self.w3 = Web3(HedgedHTTPProvider(http_url))
         if self.w3.is_connected() == True:
             logging.info(f"web3 provider {http_url} connected")
 
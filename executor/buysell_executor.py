@@ -66,7 +66,7 @@ class BuySellExecutor(BaseExecutor):
             
 
     @timer_decorator
-    def execute(self, idx, lead_block, is_buy, pair, amount_in, amount_out_min, deadline, bot=None):
+    def execute(self, idx, lead_block, is_buy, pair, amount_in, amount_out_min, deadline, bot=None, buy_amount=None):
         def prepare_tx_bot(signer, bot, nonce):
             tx = None            
             if is_buy:
@@ -141,6 +141,7 @@ class BuySellExecutor(BaseExecutor):
                 amount_in=amount_in,
                 amount_out=amount_out,
                 is_buy=is_buy,
+                buy_amount=buy_amount,
                 signer=signer,
                 bot=bot.address,
             )
@@ -159,6 +160,7 @@ class BuySellExecutor(BaseExecutor):
                 amount_in=amount_in,
                 amount_out=0,
                 is_buy=is_buy,
+                buy_amount=buy_amount,
                 signer=signer,
                 bot=bot.address,
             )
@@ -184,7 +186,7 @@ class BuySellExecutor(BaseExecutor):
                     self.bot_factory.order_broker.put(BotCreationOrder(self.accounts[idx].w3_account.address))
 
     @timer_decorator
-    def execute_paper(self, idx, lead_block, is_buy, pair, amount_in, amount_out_min, deadline, bot=None):
+    def execute_paper(self, idx, lead_block, is_buy, pair, amount_in, amount_out_min, deadline, bot=None, buy_amount=None):
         signer = self.accounts[idx].w3_account.address
         if bot is None:
             bot = self.w3.eth.contract(address=Web3.to_checksum_address(self.accounts[idx].bot.address),abi=self.bot_abi)
@@ -208,6 +210,7 @@ class BuySellExecutor(BaseExecutor):
                 amount_in=amount_in,
                 amount_out=Web3.from_wei(result[0][1], 'ether'),
                 is_buy=is_buy,
+                buy_amount=buy_amount,
                 signer=signer,
                 bot=bot.address,
                 is_paper=True,
@@ -225,6 +228,7 @@ class BuySellExecutor(BaseExecutor):
                 amount_in=amount_in,
                 amount_out=0,
                 is_buy=is_buy,
+                buy_amount=buy_amount,
                 signer=signer,
                 bot=bot.address,
                 is_paper=True,
@@ -273,6 +277,7 @@ class BuySellExecutor(BaseExecutor):
                                                 execution_data.amount_in,
                                                 execution_data.amount_out_min, 
                                                 deadline,
+                                                buy_amount=execution_data.buy_amount,
                                                 )
                         else:
                             future = executor.submit(self.execute,
@@ -283,6 +288,7 @@ class BuySellExecutor(BaseExecutor):
                                                 execution_data.amount_in,
                                                 execution_data.amount_out_min, 
                                                 deadline,
+                                                buy_amount=execution_data.buy_amount,
                                                 )
                     else:
                         logging.warning(f"EXECUTOR order dropped due to account #{idx} {self.accounts[idx].w3_account.address} has no bot")
@@ -303,6 +309,7 @@ class BuySellExecutor(BaseExecutor):
                                 execution_data.amount_out_min, 
                                 deadline,
                                 execution_data.bot,
+                                buy_amount=execution_data.buy_amount,
                             )
                         else:
                             future = executor.submit(self.execute,
@@ -314,6 +321,7 @@ class BuySellExecutor(BaseExecutor):
                                 execution_data.amount_out_min, 
                                 deadline,
                                 execution_data.bot,
+                                buy_amount=execution_data.buy_amount,
                             )
                     else:
                         logging.error(f"EXECUTOR not found signer for order {execution_data}")
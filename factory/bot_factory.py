@@ -12,7 +12,7 @@ from web3.middleware import geth_poa_middleware, construct_sign_and_send_raw_mid
 import sys # for testing
 sys.path.append('..')
 
-from library import Singleton
+from library import Singleton, HedgedHTTPProvider
 from data import W3Account, BotCreationOrder, Bot, BotUpdateOrder, ExecutionAck
 from helpers import timer_decorator, load_abi, constants
 
@@ -35,7 +35,7 @@ class BotFactory(metaclass=Singleton):
         self.result_broker = result_broker
         self.retry_queue = aioprocessing.AioQueue()
 
-        self.w3 = Web3(Web3.HTTPProvider(http_url))
+        self.w3 = Web3(HedgedHTTPProvider(http_url))
         if self.w3.is_connected() == True:
             logging.debug(f"FACTORY web3 provider {http_url} connected")
 
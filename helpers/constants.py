@@ -4,10 +4,32 @@ NORMAL_RUN_MODE=0
 WATCHING_ONLY_MODE=1
 PAPER_TRADE_MODE=2
 
+PER_CONTRACT_INGESTION_MODE=0
+MULTI_ADDRESS_INGESTION_MODE=1
+SUBSCRIPTION_INGESTION_MODE=2
+RECEIPTS_INGESTION_MODE=3
+
+PROCESS_ALL_LAG_POLICY=0
+SKIP_SUPERSEDED_LAG_POLICY=1
+
+SOLIDITY_STORAGE_LAYOUT=0
+VYPER_STORAGE_LAYOUT=1
+
+ETH_CALL_SIMULATION_ENGINE=0
+REVM_SIMULATION_ENGINE=1
+
+MM_TX_AMOUNT_THRESHOLD=0.01
+
 UNI_V2_ROUTER_ADDRESS="0x10ED43C718714eb63d5aA57B78B54704E256024E"
 ADD_LIQUIDITY_METHOD_ID="0xf305d719"
 REMOVE_LIQUIDITY_METHOD_ID="0x02751cec"
 APPROVE_METHOD_ID="0x095ea7b3"
 TRANSFER_METHOD_ID="0xa9059cbb"
 RENOUNCE_OWNERSHIP_METHOD_ID="0x715018a6"
-TRANSFER_NATIVE_METHOD_ID="0x"
\ No newline at end of file
+TRANSFER_NATIVE_METHOD_ID="0x"
+GET_RESERVES_METHOD_ID="0x0902f1ac"
+
+PAIR_CREATED_TOPIC="0x0d3648bd0f6ba80134a33ba9275ac585d9d315f0ad8355cddefde31afa28d0e9"
+SYNC_TOPIC="0x1c411e9a96e071241c2f21f7726b17ae89e3cab4c78be50e062b03a9fffbbad1"
+SWAP_TOPIC="0xd78ad95fa46c994b6551d0da85fc275fe613ce37657fb8d5e3d130840159d822"
+TRANSFER_TOPIC="0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
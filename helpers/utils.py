@@ -8,6 +8,7 @@ import pytz
 from datetime import datetime
 import eth_utils
 import rlp
+import requests
 
 def load_contract_bin(contract_path: str) -> bytes:
     with open(contract_path, 'r') as readfile:
@@ -23,6 +24,12 @@ def load_router_contract(contract_path, factory_address, wavax_address) -> bytes
     newcode = f"{hexstring[:len(hexstring)-128]}{encode_address(factory_address)}{encode_address(wavax_address)}"
     return bytes.fromhex(newcode)
 
+def load_deployed_bytecode(artifact_path: str) -> bytes:
+    # runtime code of a forge build artifact
+    with open(artifact_path, 'r') as readfile:
+        artifact = json.load(readfile)
+    return bytes.fromhex(eth_utils.remove_0x_prefix(artifact['deployedBytecode']['object']))
+
 def load_abi(abi_path: str):
     return json.load(open(abi_path, 'r'))
 
@@ -42,6 +49,9 @@ def decode_address(bytestr) -> str:
 def decode_int(bytestr, currency) -> int:
     return Web3.from_wei(int.from_bytes(bytestr, 'big'), currency)
 
+def normalize_hash(value) -> str:
+    return value.lower() if isinstance(value, str) else Web3.to_hex(value)
+
 def convert_hex_to_int(hex_str) -> int:
     return Web3.to_int(hexstr=Web3.to_hex(hexstr=hex_str))
 
@@ -53,6 +63,16 @@ def decode_pair_reserves(bytestr):
         
     return convert_hex_to_int(hexval[2:66]),convert_hex_to_int(hexval[66:130]),convert_hex_to_int(hexval[130:])
 
+def make_batch_request(http_url, payloads, timeout=10):
+    r = requests.post(http_url, json=payloads, timeout=timeout)
+    r.raise_for_status()
+
+    responses = r.json()
+    if not isinstance(responses, list):
+        raise Exception(f"batch request failed {responses}")
+
+    return {response['id']: response for response in responses}
+
 def calculate_amount_out(reserveIn, reserveOut, amountIn):
     return reserveOut - (reserveIn * reserveOut)/(reserveIn + amountIn)
 
@@ -93,6 +113,16 @@ def calculate_balance_storage_index(address, index):
         )
     )
 
+def calculate_vyper_balance_storage_index(address, index):
+    # vyper hashes the slot before the key
+    return Web3.keccak(
+        hexstr=(
+            eth_utils.remove_0x_prefix(hex(index)).rjust(64,'0')
+            +
+            eth_utils.remove_0x_prefix(address).rjust(64, '0')
+        )
+    )
+
 def calculate_allowance_storage_index(owner, spender, index):
     return Web3.keccak(
         hexstr=(
@@ -1,3 +1,5 @@
 from inspector.revm_simulator import *
 from inspector.ethcall_simulator import *
+from inspector.check_graph import *
+from inspector.bytecode_analyzer import *
 from inspector.pair_inspector import *
\ No newline at end of file
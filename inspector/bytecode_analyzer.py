@@ -0,0 +1,169 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+from web3 import Web3
+
+import sys # for testing
+sys.path.append('..')
+
+from helpers.utils import func_selector
+from data import BytecodeRisk
+
+BYTECODE_VERDICT_CACHE_CAPACITY=int(os.environ.get('BYTECODE_VERDICT_CACHE_CAPACITY', '10000'))
+
+SELFDESTRUCT_OPCODE=0xff
+DELEGATECALL_OPCODE=0xf4
+PUSH1_OPCODE=0x60
+PUSH4_OPCODE=0x63
+PUSH32_OPCODE=0x7f
+
+# EIP-1167 minimal proxies are 45 bytes, anything that small delegating is a forwarder
+PROXY_MAX_CODE_SIZE=256
+# keccak256('eip1967.proxy.implementation') - 1
+EIP1967_IMPLEMENTATION_SLOT=bytes.fromhex('360894a13ba1a3210667c828492db98dca3e2076cc3735a920a3ca505d382bbc')
+
+RISKY_SELECTORS = {
+    BytecodeRisk.BLACKLIST: [
+        'blacklist(address)',
+        'addBlacklist(address)',
+        'addToBlacklist(address)',
+        'removeFromBlacklist(address)',
+        'setBlacklist(address,bool)',
+        'blacklistAddress(address,bool)',
+        'bulkBlacklist(address[],bool)',
+        'isBlacklisted(address)',
+        'addBots(address[])',
+        'setBots(address[])',
+        'blockBots(address[])',
+        'setBot(address,bool)',
+        'delBot(address)',
+    ],
+    BytecodeRisk.TRANSFER_GATE: [
+        'openTrading()',
+        'enableTrading()',
+        'setTrading(bool)',
+        'setTradingEnabled(bool)',
+        'pause()',
+        'setPaused(bool)',
+    ],
+    BytecodeRisk.FEE_SETTER: [
+        'setFee(uint256)',
+        'setFees(uint256,uint256)',
+        'setTaxes(uint256,uint256)',
+        'setBuyFee(uint256)',
+        'setSellFee(uint256)',
+        'setBuyTax(uint256)',
+        'setSellTax(uint256)',
+        'setTaxFeePercent(uint256)',
+        'updateFees(uint256,uint256)',
+        'updateBuyFees(uint256,uint256,uint256)',
+        'updateSellFees(uint256,uint256,uint256)',
+    ],
+    BytecodeRisk.DELEGATECALL_PROXY: [
+        'upgradeTo(address)',
+        'upgradeToAndCall(address,bytes)',
+    ],
+}
+
+SELECTOR_TABLE = {bytes.fromhex(func_selector(signature)): risk for risk, signatures in RISKY_SELECTORS.items() for signature in signatures}
+
+class BytecodeVerdict:
+    def __init__(self, code_hash, code_size, risks=BytecodeRisk.NONE, signatures=None) -> None:
+        self.code_hash = code_hash
+        self.code_size = code_size
+        self.risks = risks
+        self.signatures = signatures if signatures is not None else []
+
+    def __str__(self) -> str:
+        return f"BytecodeVerdict {self.code_hash} size {self.code_size} risks {self.risks!r} signatures {self.signatures}"
+
+def disassemble(code):
+    # (opcode, immediate) pairs, push data is skipped so it is never read as opcodes
+    pc = 0
+    while pc < len(code):
+        opcode = code[pc]
+        if PUSH1_OPCODE <= opcode <= PUSH32_OPCODE:
+            size = opcode - PUSH1_OPCODE + 1
+            yield opcode, code[pc+1:pc+1+size]
+            pc += size + 1
+        else:
+            yield opcode, None
+            pc += 1
+
+def analyze_bytecode(code) -> BytecodeVerdict:
+    code = bytes(code)
+    risks = BytecodeRisk.NONE
+    signatures = []
+    has_delegatecall = False
+    has_eip1967_slot = False
+
+    for opcode, immediate in disassemble(code):
+        if opcode == SELFDESTRUCT_OPCODE:
+            risks |= BytecodeRisk.SELFDESTRUCT
+        elif opcode == DELEGATECALL_OPCODE:
+            has_delegatecall = True
+        elif opcode == PUSH4_OPCODE and immediate in SELECTOR_TABLE:
+            risks |= SELECTOR_TABLE[immediate]
+            signatures.append(immediate.hex())
+        elif opcode == PUSH32_OPCODE and immediate == EIP1967_IMPLEMENTATION_SLOT:
+            has_eip1967_slot = True
+
+    # upgrade selectors alone are not enough, the logic has to be delegated to
+    risks &= ~BytecodeRisk.DELEGATECALL_PROXY
+    if has_delegatecall and (len(code) <= PROXY_MAX_CODE_SIZE or has_eip1967_slot or any(SELECTOR_TABLE[bytes.fromhex(signature)]==BytecodeRisk.DELEGATECALL_PROXY for signature in signatures)):
+        risks |= BytecodeRisk.DELEGATECALL_PROXY
+
+    return BytecodeVerdict(Web3.keccak(code).hex(), len(code), risks, signatures)
+
+class BytecodeAnalyzer:
+    def __init__(self, w3, capacity=BYTECODE_VERDICT_CACHE_CAPACITY) -> None:
+        self.w3 = w3
+        self.capacity = capacity
+        # token -> code hash, code hash -> verdict; cloned tokens share one verdict
+        self.code_hashes = OrderedDict()
+        self.verdicts = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def code_hash(self, token):
+        # cached lookup only, None until the token has been analyzed
+        with self.lock:
+            return self.code_hashes.get(token.lower())
+
+    def analyze(self, token) -> BytecodeVerdict:
+        with self.lock:
+            code_hash = self.code_hashes.get(token.lower())
+            if code_hash is not None and code_hash in self.verdicts:
+                self.hits += 1
+                self.verdicts.move_to_end(code_hash)
+                return self.verdicts[code_hash]
+
+        code = self.w3.eth.get_code(Web3.to_checksum_address(token))
+        if len(code) == 0:
+            logging.error(f"INSPECTOR token {token} has no runtime code")
+            return None
+
+        code_hash = Web3.keccak(code).hex()
+        with self.lock:
+            verdict = self.verdicts.get(code_hash)
+            if verdict is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                verdict = analyze_bytecode(code)
+                self.verdicts[code_hash] = verdict
+                logging.debug(f"INSPECTOR {token} classified as {verdict}")
+
+            self.code_hashes[token.lower()] = code_hash
+            self.verdicts.move_to_end(code_hash)
+            for cache in [self.code_hashes, self.verdicts]:
+                while len(cache) > self.capacity:
+                    cache.popitem(last=False)
+
+        return verdict
+
+    def __str__(self) -> str:
+        return f"BytecodeAnalyzer verdicts {len(self.verdicts)} hits {self.hits} misses {self.misses}"
@@ -0,0 +1,65 @@
+import logging
+import time
+import concurrent.futures
+
+class InspectionCheck:
+    # run(*dependency values) -> value, accept(value) -> False rejects the pair
+    def __init__(self, name, run, accept=None, depends=(), local=False) -> None:
+        self.name = name
+        self.run = run
+        self.accept = accept
+        self.depends = depends
+        self.local = local
+
+    def timed_run(self, *args):
+        start_time = time.perf_counter()
+        value = self.run(*args)
+        return value, time.perf_counter() - start_time
+
+    def __str__(self) -> str:
+        return f"InspectionCheck {self.name} depends {list(self.depends)} local {self.local}"
+
+class CheckGraph:
+    def __init__(self, executor: concurrent.futures.Executor) -> None:
+        self.executor = executor
+
+    def run(self, checks, latencies) -> bool:
+        # local checks are cheap, they run inline and in order before anything is sent out
+        values = {}
+        for check in [check for check in checks if check.local]:
+            if not self.complete(check, check.timed_run(*[values[name] for name in check.depends]), values, latencies):
+                return False
+
+        pending = [check for check in checks if not check.local]
+        futures = {}
+        while len(pending)>0 or len(futures)>0:
+            for check in [check for check in pending if all(name in values for name in check.depends)]:
+                pending.remove(check)
+                futures[self.executor.submit(check.timed_run, *[values[name] for name in check.depends])] = check
+
+            if len(futures)==0:
+                logging.error(f"INSPECTOR checks {[check.name for check in pending]} have unresolved dependencies")
+                return False
+
+            done, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                check = futures.pop(future)
+                try:
+                    accepted = self.complete(check, future.result(), values, latencies)
+                except Exception as e:
+                    logging.error(f"INSPECTOR check {check.name} error {e}")
+                    accepted = False
+
+                if not accepted:
+                    # running siblings finish in the background, their values are dropped
+                    for sibling in futures:
+                        sibling.cancel()
+                    return False
+
+        return True
+
+    def complete(self, check, outcome, values, latencies) -> bool:
+        value, latency = outcome
+        values[check.name] = value
+        latencies[check.name] = round(latency, 4)
+        return check.accept is None or check.accept(value)
@@ -11,27 +11,104 @@ import eth_abi
 import sys # for testing
 sys.path.append('..')
 
-from library import Singleton
+from library import Singleton, HedgedHTTPProvider, BalanceSlotCache
 from helpers.decorators import timer_decorator, async_timer_decorator
 from helpers.utils import load_contract_bin, encode_address, encode_uint, func_selector, \
                             decode_address, decode_pair_reserves, decode_int, load_router_contract, \
                             load_abi, calculate_next_block_base_fee, calculate_balance_storage_index, rpad_int, \
-                            calculate_allowance_storage_index
+                            calculate_allowance_storage_index, calculate_vyper_balance_storage_index, load_deployed_bytecode
+from helpers import constants
 
 from data import SimulationResult, Pair
 
+HONEYPOT_INSPECTOR_ARTIFACT=os.environ.get('HONEYPOT_INSPECTOR_ARTIFACT', f"{os.path.dirname(__file__)}/../contracts/out/HoneypotInspector.sol/HoneypotInspector.json")
+HONEYPOT_INSPECTOR_ADDRESS="0x000000000000000000000000000000000000bEEF"
+
 class EthCallSimulator:
     @timer_decorator
     def __init__(self,
                  http_url,
                  signer,
                  bot,
+                 router=None,
+                 weth=None,
                  ):
         logging.debug(f"start simulation...")
 
-        self.w3 = Web3(Web3.HTTPProvider(http_url))
+        self.w3 = Web3(HedgedHTTPProvider(http_url))
         self.signer = signer
         self.bot = bot
+        self.router = router
+        self.weth = weth
+        self.balance_slots = BalanceSlotCache()
+
+        self.inspector_code = None
+        if router is not None and weth is not None:
+            try:
+                self.inspector_code = load_deployed_bytecode(HONEYPOT_INSPECTOR_ARTIFACT)
+            except Exception as e:
+                logging.warning(f"SIMULATOR honeypot inspector artifact unavailable {e}, fallback to buy/sell calls")
+
+    @timer_decorator
+    def inspect_token_by_override(self, token, amount):
+        try:
+            # buy, balance read and sell happen inside the injected inspector in a single call
+            result = self.w3.eth.call({
+                'from': self.signer,
+                'to': HONEYPOT_INSPECTOR_ADDRESS,
+                'value': Web3.to_wei(amount, 'ether'),
+                'data': bytes.fromhex(
+                    func_selector('inspect(address,address,address)') + encode_address(self.router) + encode_address(self.weth) + encode_address(token)
+                )
+            }, 'latest', {
+                HONEYPOT_INSPECTOR_ADDRESS: {
+                    'code': Web3.to_hex(self.inspector_code),
+                },
+                self.signer: {
+                    'balance': hex(10**18 + Web3.to_wei(amount, 'ether')),
+                },
+            })
+
+            return self.decode_inspection(eth_abi.decode(['(uint256,uint256,uint256,uint256,uint256,uint256,uint256)'], result)[0])
+        except Exception as e:
+            logging.error(f"SIMULATOR inspect {token} by override failed with error {e}")
+            return None
+
+    @timer_decorator
+    def inspect_tokens_by_override(self, tokens, amount):
+        try:
+            result = self.w3.eth.call({
+                'from': self.signer,
+                'to': HONEYPOT_INSPECTOR_ADDRESS,
+                'value': Web3.to_wei(amount, 'ether')*len(tokens),
+                'data': bytes.fromhex(func_selector('inspectBatch(address,address,address[])')) + eth_abi.encode(
+                    ['address', 'address', 'address[]'],
+                    [self.router, self.weth, [Web3.to_checksum_address(token) for token in tokens]],
+                ),
+            }, 'latest', {
+                HONEYPOT_INSPECTOR_ADDRESS: {
+                    'code': Web3.to_hex(self.inspector_code),
+                },
+                self.signer: {
+                    'balance': hex(10**18 + Web3.to_wei(amount, 'ether')*len(tokens)),
+                },
+            })
+
+            success, values = eth_abi.decode(['bool[]', '(uint256,uint256,uint256,uint256,uint256,uint256,uint256)[]'], result)
+            return [self.decode_inspection(values[idx]) if success[idx] else None for idx in range(len(tokens))]
+        except Exception as e:
+            logging.error(f"SIMULATOR inspect batch of {len(tokens)} tokens by override failed with error {e}")
+            return None
+
+    def decode_inspection(self, values):
+        amount_in, amount_token_expected, amount_token, amount_out_expected, amount_out, buy_gas, sell_gas = values
+
+        amount = Web3.from_wei(amount_in, 'ether')
+        slippage = (Decimal(amount_in) - Decimal(amount_out))/Decimal(amount_in)*Decimal(10000)
+        buy_tax = (Decimal(amount_token_expected) - Decimal(amount_token))/Decimal(amount_token_expected)*Decimal(100) if amount_token_expected > 0 else 0
+        sell_tax = (Decimal(amount_out_expected) - Decimal(amount_out))/Decimal(amount_out_expected)*Decimal(100) if amount_out_expected > 0 else 0
+
+        return (amount, Web3.from_wei(amount_out, 'ether'), slippage, Web3.from_wei(amount_token, 'ether'), buy_gas, sell_gas, buy_tax, sell_tax)
 
     @timer_decorator
     def inspect_token_by_transfer(self, token, amount):
@@ -129,11 +206,11 @@ class EthCallSimulator:
             signer = self.signer if signer is None else signer
             bot = self.bot if bot is None else bot
 
-            balance_slot_index = self.determine_balance_slot_index(token)
-            logging.debug(f"SIMULATOR Balance slot index {balance_slot_index}")
+            balance_slot = self.determine_balance_slot_index(token)
+            logging.debug(f"SIMULATOR Balance slot {balance_slot}")
 
-            if balance_slot_index is not None:
-                storage_index = calculate_balance_storage_index(bot, balance_slot_index)
+            if balance_slot is not None:
+                storage_index = self.calculate_storage_index(bot, balance_slot)
                 logging.debug(f"SIMULATOR Storage index {storage_index.hex()}")
 
                 result = self.w3.eth.call({
@@ -149,25 +226,50 @@ class EthCallSimulator:
         except Exception as e:
             logging.error(f"SIMULATOR Sell error {e}")
 
+    def calculate_storage_index(self, owner, balance_slot):
+        index, layout = balance_slot
+        if layout == constants.VYPER_STORAGE_LAYOUT:
+            return calculate_vyper_balance_storage_index(owner, index)
+        return calculate_balance_storage_index(owner, index)
+
     def determine_balance_slot_index(self, token):
+        balance_slot = self.balance_slots.get(token)
+        if balance_slot is not None:
+            return balance_slot
+
+        # clones of the same token share the runtime code and so the storage layout
+        code_hash = Web3.keccak(self.w3.eth.get_code(Web3.to_checksum_address(token))).hex()
+        balance_slot = self.balance_slots.get(code_hash)
+        if balance_slot is not None:
+            self.balance_slots.set([token], balance_slot)
+            return balance_slot
+
+        balance_slot = self.probe_balance_slot_index(token)
+        if balance_slot is not None:
+            self.balance_slots.set([token, code_hash], balance_slot)
+
+        return balance_slot
+
+    def probe_balance_slot_index(self, token):
         fake_amount = 10**27 # 1B
         fake_owner = self.signer
 
-        for idx in range(9):
-            storage_index = calculate_balance_storage_index(fake_owner, idx)
+        for layout in [constants.SOLIDITY_STORAGE_LAYOUT, constants.VYPER_STORAGE_LAYOUT]:
+            for idx in range(9):
+                storage_index = self.calculate_storage_index(fake_owner, (idx, layout))
 
-            result = self.w3.eth.call({
-                'from': self.signer,
-                'to': Web3.to_checksum_address(token),
-                'data': bytes.fromhex(
-                    func_selector('balanceOf(address)') + encode_address(fake_owner)
-                )
-            }, 'latest', self.create_state_diff(token, storage_index, fake_amount))
-            logging.debug(f"index {idx} get balance result fake {eth_abi.decode(['uint256'], result)}")
+                result = self.w3.eth.call({
+                    'from': self.signer,
+                    'to': Web3.to_checksum_address(token),
+                    'data': bytes.fromhex(
+                        func_selector('balanceOf(address)') + encode_address(fake_owner)
+                    )
+                }, 'latest', self.create_state_diff(token, storage_index, fake_amount))
+                logging.debug(f"index {idx} layout {layout} get balance result fake {eth_abi.decode(['uint256'], result)}")
 
-            decoded = eth_abi.decode(['uint256'], result)
-            if decoded[0] == fake_amount:
-                return idx
+                decoded = eth_abi.decode(['uint256'], result)
+                if decoded[0] == fake_amount:
+                    return (idx, layout)
 
         return None
 
@@ -180,20 +282,28 @@ class EthCallSimulator:
                 }
             }
         
+    def inspect_pairs(self, pairs, amount):
+        # pair address -> SimulationResult or None, empty when batching is unavailable
+        if self.inspector_code is None or len(pairs)==0:
+            return {}
+
+        results = self.inspect_tokens_by_override([pair.token for pair in pairs], amount)
+        if results is None:
+            return {}
+
+        return {pair.address: SimulationResult(pair, *result) if result is not None else None for pair, result in zip(pairs, results)}
+
     def inspect_pair(self, pair: Pair, amount, swap=True) -> None:
         if swap is False:
             result = self.inspect_token_by_transfer(pair.token, amount)
+        elif self.inspector_code is not None:
+            result = self.inspect_token_by_override(pair.token, amount)
         else:
             result = self.inspect_token_by_swap(pair.token, amount)
 
         if result is not None:
-            return SimulationResult(
-                pair=pair,
-                amount_in=result[0],
-                amount_out=result[1],
-                slippage=result[2],
-                amount_token=result[3],
-                )
+            # amount_in, amount_out, slippage, amount_token and the optional gas and tax figures
+            return SimulationResult(pair, *result)
         
 if __name__ == '__main__':
     from dotenv import load_dotenv
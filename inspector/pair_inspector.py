@@ -3,8 +3,9 @@ import os
 import logging
 import time
 import datetime
+import math
+import copy
 from decimal import Decimal
-import requests
 import concurrent.futures
 
 from web3 import Web3
@@ -14,15 +15,16 @@ import eth_abi
 import sys # for testing
 sys.path.append('..')
 
-from library import Singleton
+from library.etherscan_client import ETHERSCAN_RATE_LIMIT
+from library import Singleton, HedgedHTTPProvider, EtherscanClient, TxIndex, CreatorBlacklist, SimulationCache
 from helpers.decorators import timer_decorator, async_timer_decorator
-from helpers.utils import load_contract_bin, encode_address, encode_uint, func_selector, \
+from helpers.utils import make_batch_request, load_contract_bin, encode_address, encode_uint, func_selector, \
                             decode_address, decode_pair_reserves, decode_int, load_router_contract, \
                             load_abi, calculate_next_block_base_fee, calculate_balance_storage_index, rpad_int, \
                             calculate_allowance_storage_index
 from helpers import constants
-from data import Pair, MaliciousPair, InspectionResult, SimulationResult
-from inspector import RevmSimulator, EthCallSimulator
+from data import Pair, MaliciousPair, BytecodeRisk, InspectionResult, SimulationResult, PendingPair
+from inspector import RevmSimulator, EthCallSimulator, InspectionCheck, CheckGraph, BytecodeAnalyzer
 
 # django
 import django
@@ -31,10 +33,10 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "admin.settings")
 django.setup()
 import console.models
 
-STATUS_CODE_SUCCESS=200
 PAGE_SIZE=100
-MM_TX_AMOUNT_THRESHOLD=0.01
 CREATOR_TX_HISTORY_PAGE_SIZE=500
+TXLIST_PAGE_SIZE=1000
+TXLIST_MAX_PAGES=10 # etherscan serves at most 10k results per query
 
 SIMULATION_AMOUNT=0.01
 SLIPPAGE_MIN_THRESHOLD = 30 # in basis points
@@ -48,6 +50,16 @@ ROGUE_CREATOR_FROZEN_SECONDS=int(os.environ.get('ROGUE_CREATOR_FROZEN_SECONDS'))
 HOLD_MAX_DURATION_SECONDS=int(os.environ.get('HOLD_MAX_DURATION_SECONDS'))
 MAX_INSPECT_ATTEMPTS=int(os.environ.get('MAX_INSPECT_ATTEMPTS'))
 INSPECT_INTERVAL_SECONDS=int(os.environ.get('INSPECT_INTERVAL_SECONDS'))
+INGESTION_MODE=int(os.environ.get('INGESTION_MODE', '0'))
+SIMULATION_ENGINE=int(os.environ.get('SIMULATION_ENGINE', '0'))
+BATCH_SIMULATION=int(os.environ.get('BATCH_SIMULATION', '0'))
+TX_INDEX_RESCAN_BLOCKS=int(os.environ.get('TX_INDEX_RESCAN_BLOCKS', '3'))
+INSPECTION_CHECK_WORKERS=int(os.environ.get('INSPECTION_CHECK_WORKERS', '16'))
+SIMULATION_CACHE=int(os.environ.get('SIMULATION_CACHE', '1'))
+STORAGE_FINGERPRINT_SLOTS=int(os.environ.get('STORAGE_FINGERPRINT_SLOTS', '8'))
+SIMULATION_RESERVE_BUCKET_RATIO=float(os.environ.get('SIMULATION_RESERVE_BUCKET_RATIO', '1.25'))
+BYTECODE_ANALYSIS=int(os.environ.get('BYTECODE_ANALYSIS', '1'))
+BYTECODE_REJECT_MASK=BytecodeRisk(int(os.environ.get('BYTECODE_REJECT_MASK', str(int(BytecodeRisk.SELFDESTRUCT|BytecodeRisk.DELEGATECALL_PROXY|BytecodeRisk.BLACKLIST)))))
 
 from enum import IntEnum
 
@@ -63,12 +75,18 @@ class PairInspector(metaclass=Singleton):
                  pair_abi,
                  weth_abi,
                  bot_abi,
+                 etherscan_rate_limit=ETHERSCAN_RATE_LIMIT,
                  ) -> None:
         
         self.http_url = http_url
-        self.w3 = Web3(Web3.HTTPProvider(http_url))
-        self.api_keys = api_keys.split(',')
-        self.etherscan_api_url = etherscan_api_url
+        self.w3 = Web3(HedgedHTTPProvider(http_url))
+        self.etherscan = EtherscanClient(etherscan_api_url, api_keys, rate_limit=etherscan_rate_limit)
+        self.tx_index = TxIndex()
+        self.blacklist = CreatorBlacklist(frozen_seconds=ROGUE_CREATOR_FROZEN_SECONDS)
+        self.load_blacklist()
+        self.bytecode_analyzer = BytecodeAnalyzer(self.w3)
+        self.simulation_cache = SimulationCache()
+        self.check_graph = CheckGraph(concurrent.futures.ThreadPoolExecutor(max_workers=INSPECTION_CHECK_WORKERS))
 
         self.signer = signer
         self.router = router
@@ -78,13 +96,37 @@ class PairInspector(metaclass=Singleton):
         self.pair_abi = pair_abi
         self.weth_abi = weth_abi
         self.bot_abi = bot_abi
-        self.counter = 0
+        self.verified_tokens = set()
+
+        if SIMULATION_ENGINE==constants.REVM_SIMULATION_ENGINE:
+            self.simulator = RevmSimulator(
+                http_url=http_url,
+                signer=signer,
+                router_address=router,
+                weth=weth,
+                bot=bot,
+                pair_abi=pair_abi,
+                weth_abi=weth_abi,
+                bot_abi=bot_abi,
+            )
+        else:
+            self.simulator = EthCallSimulator(
+                http_url=http_url,
+                signer=signer,
+                bot=bot,
+                router=router,
+                weth=weth,
+            )
 
-        self.simulator = EthCallSimulator(
-            http_url=http_url,
-            signer=signer,
-            bot=bot,
-        )
+    @timer_decorator
+    def load_blacklist(self) -> None:
+        # later additions arrive through add_blacklist, the db is only read once
+        blacklist = console.models.BlackList.objects.filter(frozen_at__gte=make_aware(datetime.datetime.now()-datetime.timedelta(seconds=ROGUE_CREATOR_FROZEN_SECONDS))).filter(created_at__gte=make_aware(datetime.datetime.now() - datetime.timedelta(days=90)))
+        self.blacklist.load([(item.address, item.frozen_at.timestamp(), item.created_at.timestamp()) for item in blacklist if item.address is not None])
+
+    def add_blacklist(self, creators) -> None:
+        for creator in creators:
+            self.blacklist.add(creator)
 
     @timer_decorator
     def is_contract_verified(self, pair: Pair) -> False:
@@ -98,45 +140,120 @@ class PairInspector(metaclass=Singleton):
                 
             return False
         
-        if pair.contract_verified:
+        if pair.contract_verified or pair.token.lower() in self.verified_tokens:
             return True
         
-        r=requests.get(f"{self.etherscan_api_url}/api?module=contract&action=getsourcecode&address={pair.token}&apikey={self.select_api_key()}")
-        if r.status_code==STATUS_CODE_SUCCESS:
-            res=r.json()
+        # verified source never changes, unverified may still get verified later
+        res=self.etherscan.get(
+            {'module': 'contract', 'action': 'getsourcecode', 'address': pair.token},
+            cache_forever=lambda res: int(res['status'])==1 and len(res['result'][0].get('SourceCode',''))>0,
+        )
+        if res is not None:
             logging.debug(f"INSPECTOR GetSourceCode result {res}")
 
             if int(res['status'])==1 and len(res['result'][0].get('Library',''))==0:
                 if CONTRACT_VERIFIED_REQUIRED==1:
-                    return True if len(res['result'][0].get('SourceCode',''))>0 and len(res['result'][0].get('ContractName'))>0 and not source_code_is_malicious(res['result'][0]['SourceCode']) else False
+                    if len(res['result'][0].get('SourceCode',''))>0 and len(res['result'][0].get('ContractName'))>0 and not source_code_is_malicious(res['result'][0]['SourceCode']):
+                        self.verified_tokens.add(pair.token.lower())
+                        return True
+                    return False
                 return True
         else:
-            logging.error(f"INSPECTOR EtherscanAPI GetSourceCode error:: {r.status_code}")
+            logging.error(f"INSPECTOR EtherscanAPI GetSourceCode {pair.token} failed")
                 
         return False
         
     @timer_decorator
-    def is_creator_call_contract(self, pair, from_block, to_block):
-        txlist = self.get_txlist(pair.token, from_block, to_block)
-        
-        if int(txlist['status'])==constants.TX_SUCCESS_STATUS and len(txlist['result'])>0:
-            txs = [tx for tx in txlist['result'] if int(tx['txreceipt_status'])==constants.TX_SUCCESS_STATUS and tx['to'].lower()==pair.token.lower() and tx['from'].lower()==pair.creator.lower()]
+    def is_creator_call_contract(self, pair, creation_block, from_block, to_block):
+        if creation_block is None:
+            return 0
+
+        txs = self.get_token_txs(pair.token, from_block, to_block)
+        if txs is not None and len(txs)>0:
+            txs = [tx for tx in txs if int(tx['txreceipt_status'])==constants.TX_SUCCESS_STATUS and tx['to'].lower()==pair.token.lower() and tx['from'].lower()==pair.creator.lower()]
             if len(txs)>0:
                 logging.warning(f"INSPECTOR Pair {pair.address} detected malicious due to abnormal incoming txs {txs}")
             return len(txs)
             
         return 0
     
-    def get_txlist(self, contract, start_block, end_block, page_size=100, sort='desc'):
-        r=requests.get(f"{self.etherscan_api_url}/api?module=account&action=txlist&address={contract}&startblock={start_block}&endblock={end_block}&page=1&offset={page_size}&sort={sort}&apikey={self.select_api_key()}")
-        if r.status_code==STATUS_CODE_SUCCESS:
-            res=r.json()
-            return res
-        return None
-    
-    def select_api_key(self):
-        self.counter+=1
-        return self.api_keys[self.counter % len(self.api_keys)]
+    def get_txlist(self, contract, start_block, end_block, page_size=100, sort='desc', page=1):
+        return self.etherscan.get({
+            'module': 'account',
+            'action': 'txlist',
+            'address': contract,
+            'startblock': start_block,
+            'endblock': end_block,
+            'page': page,
+            'offset': page_size,
+            'sort': sort,
+        })
+
+    def pair_created_block(self, pair, block_number):
+        # last_inspected_block stays at the block the pair was created in
+        return pair.last_inspected_block if pair.last_inspected_block>0 else block_number
+
+    def get_creation_block(self, token, fallback_block=None):
+        history = self.tx_index.get(token)
+        if history is not None and not history.is_provisional:
+            return history.creation_block
+
+        res=self.etherscan.get(
+            {'module': 'contract', 'action': 'getcontractcreation', 'contractaddresses': token},
+            cache_forever=lambda res: int(res['status'])==1,
+        )
+        if res is None:
+            logging.error(f"INSPECTOR GetContractCreation {token} failed")
+            return history.creation_block if history is not None else None
+
+        if int(res['status'])!=1 or res['result'][0]['txHash'] is None:
+            if fallback_block is None:
+                logging.error(f"INSPECTOR GetContractCreation {token} not indexed")
+                return None
+
+            # brand-new tokens are not indexed yet, scan from the fallback until etherscan catches up
+            logging.warning(f"INSPECTOR GetContractCreation {token} not indexed, scan from block #{fallback_block}")
+            return self.tx_index.track(token, fallback_block, is_provisional=True).creation_block
+
+        try:
+            tx_receipt = self.w3.eth.get_transaction_receipt(res['result'][0]['txHash'])
+        except Exception as e:
+            logging.error(f"INSPECTOR creation receipt of {token} error {e}")
+            return None
+
+        return self.tx_index.track(token, tx_receipt['blockNumber']).creation_block
+
+    def get_token_txs(self, token, from_block, to_block):
+        history = self.tx_index.get(token)
+        if history is None:
+            return None
+
+        if history.last_block < to_block:
+            # etherscan indexes the head with a lag, so the tail of the previous scan is fetched again
+            start_block = max(history.creation_block, history.last_block + 1 - TX_INDEX_RESCAN_BLOCKS)
+            txs = []
+            is_complete = False
+            for page in range(1, TXLIST_MAX_PAGES + 1):
+                txlist = self.get_txlist(token, start_block, to_block, page_size=TXLIST_PAGE_SIZE, sort='asc', page=page)
+                # an empty range comes back with status 0 and an empty list
+                if txlist is None or not isinstance(txlist.get('result'), list):
+                    return None
+
+                txs += txlist['result']
+                if len(txlist['result']) < TXLIST_PAGE_SIZE:
+                    is_complete = True
+                    break
+
+            if not is_complete:
+                # the last fetched block may be cut by the page cap, the next scan resumes from it
+                self.tx_index.merge(token, txs, int(txs[-1]['blockNumber']) - 1)
+                logging.warning(f"INSPECTOR {history} hit the txlist page cap scanning #{start_block}-#{to_block}")
+                return None
+
+            self.tx_index.merge(token, txs, to_block)
+            logging.debug(f"INSPECTOR {history} after scanning #{start_block}-#{to_block}")
+
+        return history.between(from_block, to_block)
             
     @timer_decorator
     def number_tx_mm(self, pair, from_block, to_block) -> 0:
@@ -146,42 +263,108 @@ class PairInspector(metaclass=Singleton):
                 toBlock = to_block,
             )
         if logs != ():
-            txs=[log for log in logs if (Web3.from_wei(log['args']['amount0In'], 'ether')>MM_TX_AMOUNT_THRESHOLD and pair.token_index==1) or (Web3.from_wei(log['args']['amount1In'], 'ether')>MM_TX_AMOUNT_THRESHOLD and pair.token_index==0)]
+            txs=[log for log in logs if (Web3.from_wei(log['args']['amount0In'], 'ether')>constants.MM_TX_AMOUNT_THRESHOLD and pair.token_index==1) or (Web3.from_wei(log['args']['amount1In'], 'ether')>constants.MM_TX_AMOUNT_THRESHOLD and pair.token_index==0)]
             return len(txs)
         
         return 0
         
-    @timer_decorator
-    def is_malicious(self, pair, block_number, is_initial=False) -> MaliciousPair:
-        blacklist = console.models.BlackList.objects.filter(address=pair.creator.lower()).filter(frozen_at__gte=make_aware(datetime.datetime.now()-datetime.timedelta(seconds=ROGUE_CREATOR_FROZEN_SECONDS))).filter(created_at__gte=make_aware(datetime.datetime.now() - datetime.timedelta(days=90))).first()
-        if blacklist is not None:
+    def is_creator_blacklisted(self, pair) -> bool:
+        if pair.creator in self.blacklist:
             logging.warning(f"INSPECTOR pair {pair.address} is blacklisted due to rogue creator")
-            return MaliciousPair.CREATOR_BLACKLISTED
-        
+            return True
+        return False
+
+    @timer_decorator
+    def is_malicious_tx(self, pair, creation_block, block_number) -> MaliciousPair:
+        if creation_block is None:
+            return MaliciousPair.UNVERIFIED
+
         # check malicious tx
         try:
-            r=requests.get(f"{self.etherscan_api_url}/api?module=contract&action=getcontractcreation&contractaddresses={pair.token}&apikey={self.select_api_key()}")
-            if r.status_code==STATUS_CODE_SUCCESS:
-                res=r.json()
-                if int(res['status'])==1 and res['result'][0]['txHash'] is not None:
-                    tx_receipt = self.w3.eth.get_transaction_receipt(res['result'][0]['txHash'])
-                    txlist = self.get_txlist(pair.token, tx_receipt['blockNumber'], block_number)
-                    if int(txlist['status'])==constants.TX_SUCCESS_STATUS and txlist['result'] is not None:
-                        for tx in txlist['result']:
-                            if int(tx['txreceipt_status'])==constants.TX_SUCCESS_STATUS and tx['to'].lower()==pair.token.lower() and tx['methodId'] not in [constants.APPROVE_METHOD_ID, constants.RENOUNCE_OWNERSHIP_METHOD_ID, constants.TRANSFER_METHOD_ID, constants.TRANSFER_NATIVE_METHOD_ID]:
-                                logging.warning(f"INSPECTOR pair {pair.address} detected malicious due to abnormal incoming tx {tx}")
-                                return MaliciousPair.MALICIOUS_TX_IN
-            else:
-                logging.error(f"INSPECTOR GetContractCreation error {r.status_code}")
+            txs = self.get_token_txs(pair.token, creation_block, block_number)
+            if txs is None:
                 return MaliciousPair.UNVERIFIED
+
+            for tx in txs:
+                if int(tx['txreceipt_status'])==constants.TX_SUCCESS_STATUS and tx['to'].lower()==pair.token.lower() and tx['methodId'] not in [constants.APPROVE_METHOD_ID, constants.RENOUNCE_OWNERSHIP_METHOD_ID, constants.TRANSFER_METHOD_ID, constants.TRANSFER_NATIVE_METHOD_ID]:
+                    logging.warning(f"INSPECTOR pair {pair.address} detected malicious due to abnormal incoming tx {tx}")
+                    return MaliciousPair.MALICIOUS_TX_IN
         except Exception as e:
             logging.error(f"INSPECTOR IsMalicious check error:: {e}")
             return MaliciousPair.UNVERIFIED
 
         return MaliciousPair.UNMALICIOUS
     
+    def is_reserve_inrange(self, pair) -> bool:
+        return pair.reserve_eth>=RESERVE_ETH_MIN_THRESHOLD and pair.reserve_eth<=RESERVE_ETH_MAX_THRESHOLD
+
+    def storage_fingerprint(self, token, block_number):
+        payloads = [{
+            'jsonrpc': '2.0',
+            'id': slot,
+            'method': 'eth_getStorageAt',
+            'params': [token, hex(slot), hex(block_number)],
+        } for slot in range(STORAGE_FINGERPRINT_SLOTS)]
+        responses = make_batch_request(self.w3.provider.ranked_endpoints()[0], payloads)
+
+        values = []
+        for slot in range(STORAGE_FINGERPRINT_SLOTS):
+            value = int(responses[slot]['result'], 16)
+            # owners, pairs and routers differ between clones of one template, fees and limits do not
+            values.append('address' if 2**96 <= value < 2**160 else hex(value))
+        return Web3.keccak(text=','.join(values)).hex()
+
+    def simulation_key(self, pair, block_number, code_hash):
+        reserve_bucket = int(math.log(float(pair.reserve_eth), SIMULATION_RESERVE_BUCKET_RATIO)) if pair.reserve_eth > 0 else 0
+        return (code_hash, self.storage_fingerprint(pair.token, block_number), reserve_bucket, pair.token_index)
+
+    def remember_simulation(self, pair, block_number, simulation_result):
+        try:
+            verdict = self.bytecode_analyzer.analyze(pair.token)
+            if verdict is not None:
+                self.simulation_cache.put(self.simulation_key(pair, block_number, verdict.code_hash), simulation_result)
+        except Exception as e:
+            logging.error(f"INSPECTOR remember simulation of {pair.token} error {e}")
+
+    def simulate(self, pair, block_number, simulation_results=None) -> SimulationResult:
+        def compute():
+            return self.simulator.inspect_pair(pair, SIMULATION_AMOUNT)
+
+        key = None
+        is_precomputed = simulation_results is not None and pair.address in simulation_results
+        # only a code hash the bytecode check already fetched is looked up, a first sight never waits for it
+        code_hash = self.bytecode_analyzer.code_hash(pair.token) if SIMULATION_CACHE==1 and not is_precomputed else None
+        if code_hash is not None:
+            try:
+                key = self.simulation_key(pair, block_number, code_hash)
+            except Exception as e:
+                logging.error(f"INSPECTOR simulation key of {pair.token} error {e}")
+
+        if key is None:
+            simulation_result = simulation_results[pair.address] if is_precomputed else compute()
+            if SIMULATION_CACHE==1 and simulation_result is not None:
+                # keyed in the background so clones and re-inspections hit from the next attempt
+                self.check_graph.executor.submit(self.remember_simulation, pair, block_number, simulation_result)
+        else:
+            simulation_result = self.simulation_cache.get_or_compute(key, compute)
+            if simulation_result is not None and simulation_result.pair.address != pair.address:
+                # verdict of a clone, reported against this pair
+                simulation_result = copy.copy(simulation_result)
+                simulation_result.pair = pair
+
+        if simulation_result is not None and simulation_result.sell_failed_horizon is not None:
+            logging.warning(f"INSPECTOR simulation result rejected due to sell failing {simulation_result.sell_failed_horizon} blocks ahead")
+            return None
+
+        if simulation_result is not None:
+            if simulation_result.slippage > SLIPPAGE_MIN_THRESHOLD and simulation_result.slippage < SLIPPAGE_MAX_THRESHOLD:
+                return simulation_result
+            logging.warning(f"INSPECTOR simulation result rejected due to abnormal slippage {simulation_result.slippage}")
+
+        return None
+
     @timer_decorator
-    def inspect_pair(self, pair: Pair, block_number, is_initial=False) -> InspectionResult:
+    def inspect_pair(self, pair: Pair, block_number, is_initial=False, simulation_results=None) -> InspectionResult:
         from_block=pair.last_inspected_block+1 if pair.last_inspected_block>0 else block_number
 
         result = InspectionResult(
@@ -190,54 +373,118 @@ class PairInspector(metaclass=Singleton):
             to_block=block_number,
         )
 
-        if pair.reserve_eth>=RESERVE_ETH_MIN_THRESHOLD and pair.reserve_eth<=RESERVE_ETH_MAX_THRESHOLD:
-            result.reserve_inrange=True
+        def accept_reserve(value):
+            result.reserve_inrange=value
+            return value or not is_initial
 
-        if is_initial and not result.reserve_inrange:
-            return result        
+        def accept_blacklisted(value):
+            if value:
+                result.is_malicious=MaliciousPair.CREATOR_BLACKLISTED
+            return not value
 
-        result.is_malicious=self.is_malicious(pair, block_number, is_initial)
-        if result.is_malicious != MaliciousPair.UNMALICIOUS:
-            return result
+        def accept_bytecode(verdict):
+            if verdict is None:
+                return False
+
+            result.bytecode_risk=verdict.risks
+            if verdict.risks & BYTECODE_REJECT_MASK:
+                logging.warning(f"INSPECTOR pair {pair.address} rejected due to risky bytecode {verdict}")
+                return False
+            return True
+
+        def accept_creation(value):
+            if value is None:
+                result.is_malicious=MaliciousPair.UNVERIFIED
+            return value is not None
+
+        def accept_malicious(value):
+            result.is_malicious=value
+            return value==MaliciousPair.UNMALICIOUS
+
+        def accept_verified(value):
+            # TODO: try to verify multiple times
+            result.contract_verified=value
+            return True
+
+        def accept_creator_call(value):
+            result.is_creator_call_contract=value
+            return value==0
+
+        def accept_mm(value):
+            result.number_tx_mm=value
+            return True
+
+        def accept_simulation(value):
+            result.simulation_result=value
+            if value is not None:
+                limits = [limit for limit in [value.max_buy_amount, value.max_sell_amount] if limit is not None]
+                result.max_amount_in = min(limits) if len(limits)>0 else None
+            return value is not None
+
+        # a rejected pair never gets a simulation result, so the first rejection settles the inspection
+        checks = [
+            InspectionCheck('reserve', lambda: self.is_reserve_inrange(pair), accept_reserve, local=True),
+            InspectionCheck('blacklist', lambda: self.is_creator_blacklisted(pair), accept_blacklisted, local=True),
+        ]
+
+        if BYTECODE_ANALYSIS==1:
+            checks.append(InspectionCheck('bytecode', lambda: self.bytecode_analyzer.analyze(pair.token), accept_bytecode))
+
+        checks += [
+            InspectionCheck('creation', lambda: self.get_creation_block(pair.token, self.pair_created_block(pair, block_number)), accept_creation),
+            InspectionCheck('malicious', lambda creation_block: self.is_malicious_tx(pair, creation_block, block_number), accept_malicious, depends=('creation',)),
+            InspectionCheck('verified', lambda: self.is_contract_verified(pair), accept_verified),
+        ]
 
-        # TODO: try to verify multiple times
-        result.contract_verified=self.is_contract_verified(pair)
-        #if not result.contract_verified:
-            #return result
-        
         if not is_initial:
-            result.is_creator_call_contract=self.is_creator_call_contract(pair,from_block,block_number)
-            if result.is_creator_call_contract>0:                
-                return result
-        
-            result.number_tx_mm=self.number_tx_mm(pair,from_block,block_number)
-
-        # simulator = RevmSimulator(
-        #     http_url=self.http_url,
-        #     signer=self.signer,
-        #     router_address=self.router,
-        #     weth=self.weth,
-        #     bot=self.bot,
-        #     pair_abi=self.pair_abi,
-        #     weth_abi=self.weth_abi,
-        #     bot_abi=self.bot_abi,
-        # )
-
-        simulation_result = self.simulator.inspect_pair(pair, SIMULATION_AMOUNT)
-        if simulation_result is not None:
-            if simulation_result.slippage > SLIPPAGE_MIN_THRESHOLD and simulation_result.slippage < SLIPPAGE_MAX_THRESHOLD:
-                result.simulation_result=simulation_result
+            checks.append(InspectionCheck('creator_call', lambda creation_block: self.is_creator_call_contract(pair, creation_block, from_block, block_number), accept_creator_call, depends=('creation',)))
+
+            if INGESTION_MODE==constants.RECEIPTS_INGESTION_MODE:
+                # swaps are already counted by the watcher from block receipts
+                checks.append(InspectionCheck('mm', lambda: pair.number_tx_mm, accept_mm, local=True))
             else:
-                logging.warning(f"INSPECTOR simulation result rejected due to abnormal slippage {simulation_result.slippage}")
+                checks.append(InspectionCheck('mm', lambda: self.number_tx_mm(pair, from_block, block_number), accept_mm))
+
+        checks.append(InspectionCheck('simulation', lambda: self.simulate(pair, block_number, simulation_results), accept_simulation))
+
+        self.check_graph.run(checks, result.check_latencies)
 
         return result
     
+    @timer_decorator
+    def prewarm(self, pending_pair: PendingPair) -> None:
+        # warm the per-token checks while the addLiquidity tx is still pending
+        try:
+            pair = Pair(
+                token=pending_pair.token,
+                token_index=0,
+                address=None,
+                creator=pending_pair.creator,
+            )
+
+            contract_verified = self.is_contract_verified(pair)
+            logging.warning(f"INSPECTOR prewarm {pending_pair.token} contract verified {contract_verified}")
+        except Exception as e:
+            logging.error(f"INSPECTOR prewarm {pending_pair.token} error {e}")
+
     @timer_decorator
     def inspect_batch(self, pairs, block_number, is_initial=False):
         results = []
 
+        if SIMULATION_ENGINE==constants.REVM_SIMULATION_ENGINE:
+            try:
+                self.simulator.set_block(block_number)
+            except Exception as e:
+                logging.error(f"INSPECTOR pin simulator to block #{block_number} error {e}")
+
+        simulation_results = None
+        if BATCH_SIMULATION==1 and SIMULATION_ENGINE==constants.ETH_CALL_SIMULATION_ENGINE:
+            # one call simulates every candidate, pairs out of reserve range are skipped anyway on first sight
+            candidates = [pair for pair in pairs if not is_initial or self.is_reserve_inrange(pair)]
+            simulation_results = self.simulator.inspect_pairs(candidates, SIMULATION_AMOUNT)
+
         with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            future_to_pair = {executor.submit(self.inspect_pair,pair,block_number,is_initial): pair.address for pair in pairs}
+            future_to_pair = {executor.submit(self.inspect_pair,pair,block_number,is_initial,simulation_results): pair.address for pair in pairs}
             for future in concurrent.futures.as_completed(future_to_pair):
                 pair = future_to_pair[future]
                 try:
@@ -247,6 +494,7 @@ class PairInspector(metaclass=Singleton):
                 except Exception as e:
                     logging.error(f"INSPECTOR inspect pair {pair} error {e}")
 
+        logging.info(f"INSPECTOR {self.simulation_cache}")
         return results
         
 if __name__=="__main__":
@@ -286,8 +534,8 @@ if __name__=="__main__":
     )
 
     #print("contract verified") if inspector.is_contract_verified(pair) else print(f"contract unverified")
-    #print(f"number called {inspector.is_creator_call_contract(pair, 41665828, 41666241)}")
+    #print(f"number called {inspector.is_creator_call_contract(pair, 41665828, 41665828, 41666241)}")
     #print(f"number mm_tx {inspector.number_tx_mm(pair, 41665828, 41665884)}")
-    #print(f"is malicious {inspector.is_malicious(pair, 41665828, is_initial=True)}")
+    #print(f"is malicious {inspector.is_malicious_tx(pair, 41665828, 41665828)}")
 
     inspector.inspect_batch([pair], 41945284, is_initial=True)
\ No newline at end of file
@@ -2,18 +2,20 @@ import asyncio
 import os
 import logging
 import time
+import concurrent.futures
 from decimal import Decimal
 
 from web3 import Web3
+from web3.middleware import geth_poa_middleware
 from uniswap_universal_router_decoder import FunctionRecipient, RouterCodec
 
-from pyrevm import EVM
+from pyrevm import EVM, BlockEnv, AccountInfo
 import eth_abi
 
 import sys # for testing
 sys.path.append('..')
 
-from library import Singleton
+from library import Singleton, HedgedHTTPProvider
 from helpers.decorators import timer_decorator, async_timer_decorator
 from helpers.utils import load_contract_bin, encode_address, encode_uint, func_selector, \
                             decode_address, decode_pair_reserves, decode_int, load_router_contract, \
@@ -22,6 +24,14 @@ from helpers.utils import load_contract_bin, encode_address, encode_uint, func_s
 
 from data import SimulationResult, Pair
 
+SIGNER_FAKE_BALANCE=1000*10**18
+SIMULATION_HORIZON_BLOCKS=[int(blocks) for blocks in os.environ.get('SIMULATION_HORIZON_BLOCKS', '5,20,100').split(',') if len(blocks)>0]
+BLOCK_TIME_SECONDS=int(os.environ.get('BLOCK_TIME_SECONDS', '3'))
+TRADE_LIMIT_SEARCH=int(os.environ.get('TRADE_LIMIT_SEARCH', '1'))
+TRADE_LIMIT_SEARCH_MAX_AMOUNT=Decimal(os.environ.get('TRADE_LIMIT_SEARCH_MAX_AMOUNT', '1'))
+TRADE_LIMIT_SEARCH_STEPS=int(os.environ.get('TRADE_LIMIT_SEARCH_STEPS', '12'))
+SIMULATION_LADDER=[float(amount) for amount in os.environ.get('SIMULATION_LADDER', '0.05,0.1,0.2,0.5').split(',') if len(amount)>0]
+
 class RevmSimulator:
     @timer_decorator
     def __init__(self, 
@@ -36,7 +46,8 @@ class RevmSimulator:
                  ):
         logging.debug(f"start simulation...")
 
-        self.evm = EVM(fork_url=http_url)
+        self.w3 = Web3(HedgedHTTPProvider(http_url))
+        self.w3.middleware_onion.inject(geth_poa_middleware, layer=0)
 
         self.http_url = http_url
         self.signer = signer
@@ -44,63 +55,207 @@ class RevmSimulator:
         self.router_address = router_address
         self.weth = weth
 
-        self.w3 = Web3(Web3.HTTPProvider(http_url))
         self.pair_abi = pair_abi
         self.weth_contract = self.w3.eth.contract(address=weth, abi=weth_abi)
         self.bot = self.w3.eth.contract(address=bot, abi=bot_abi)
-        
+
+        # the fork is only touched from this thread, one pair simulation at a time
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.evm = None
+        self.block_number = 0
+        self.block_env = None
+
+        # code never changes, so it is carried over to the fork of every new block
+        self.immutable_codes = {}
+        self.immutable_addresses = [router_address, bot]
+
+    def set_block(self, block_number) -> None:
+        self.executor.submit(self.pin_block, block_number).result()
+
     @timer_decorator
-    def inspect_token_by_swap(self, token, amount) -> None:
-        try:
-            # fake balance 
-            logging.debug(f"Balance before {Web3.from_wei(self.evm.get_balance(self.signer), 'ether')}")
-            self.evm.set_balance(self.signer, 1000*10**18)
-            logging.debug(f"Balance after {Web3.from_wei(self.evm.get_balance(self.signer), 'ether')}")
-
-            # buy
-            result = self.evm.message_call(
-                caller=self.signer,
-                to=self.bot.address,
-                value=Web3.to_wei(amount, 'ether'),
-                calldata=bytes.fromhex(
-                    func_selector('buy(address,uint256)') + encode_address(token) + encode_uint(int(time.time()) + 1000)
-                )
+    def pin_block(self, block_number) -> None:
+        if self.evm is not None and block_number <= self.block_number:
+            return
+
+        for address in self.immutable_addresses:
+            if self.evm is not None and address not in self.immutable_codes:
+                self.immutable_codes[address] = self.evm.get_code(address)
+
+        block = self.w3.eth.get_block(block_number)
+
+        # storage read from the previous fork is stale once the chain moved on
+        self.evm = EVM(fork_url=self.w3.provider.ranked_endpoints()[0], fork_block=hex(block_number))
+        self.block_env = BlockEnv(
+            number=block_number,
+            timestamp=block['timestamp'],
+            basefee=block.get('baseFeePerGas', 0),
+            gas_limit=block['gasLimit'],
+        )
+        self.evm.set_block_env(self.block_env)
+
+        for address, code in self.immutable_codes.items():
+            if code is not None:
+                self.evm.insert_account_info(address, AccountInfo(code=code))
+
+        # fake balance
+        self.evm.set_balance(self.signer, SIGNER_FAKE_BALANCE)
+
+        self.block_number = block_number
+        logging.debug(f"SIMULATOR fork pinned to block #{block_number}")
+
+    def buy(self, token, amount) -> int:
+        result = self.evm.message_call(
+            caller=self.signer,
+            to=self.bot.address,
+            value=Web3.to_wei(amount, 'ether'),
+            calldata=bytes.fromhex(
+                func_selector('buy(address,uint256)') + encode_address(token) + encode_uint(int(time.time()) + 1000)
             )
+        )
 
-            resultBuy = eth_abi.decode(['uint[]'], result)
+        resultBuy = eth_abi.decode(['uint[]'], result)
 
-            assert len(resultBuy[0]) == 2
-            assert resultBuy[0][0] == Web3.to_wei(amount, 'ether')
+        assert len(resultBuy[0]) == 2
+        assert resultBuy[0][0] == Web3.to_wei(amount, 'ether')
 
-            logging.debug(f"SIMULATOR buy result {resultBuy}")
+        logging.debug(f"SIMULATOR buy result {resultBuy}")
+        return resultBuy[0][1]
 
-            # sell
-            result = self.evm.message_call(
-                caller=self.signer,
-                to=self.bot.address,
-                calldata=bytes.fromhex(
-                    func_selector('sell(address,address,uint256)') + encode_address(token) + encode_address(self.signer) + encode_uint(int(time.time()) + 1000)
-                )
+    def sell(self, token, amount_token, timestamp=None) -> int:
+        timestamp = timestamp if timestamp is not None else int(time.time())
+        result = self.evm.message_call(
+            caller=self.signer,
+            to=self.bot.address,
+            calldata=bytes.fromhex(
+                func_selector('sell(address,address,uint256)') + encode_address(token) + encode_address(self.signer) + encode_uint(timestamp + 1000)
             )
+        )
 
-            resultSell = eth_abi.decode(['uint[]'], result)
+        resultSell = eth_abi.decode(['uint[]'], result)
 
-            assert len(resultSell[0]) == 2
-            assert resultSell[0][0] == resultBuy[0][1]
+        assert len(resultSell[0]) == 2
+        assert resultSell[0][0] == amount_token
 
-            logging.debug(f"SIMULATOR sell result {resultSell}")
+        logging.debug(f"SIMULATOR sell result {resultSell}")
+        return resultSell[0][1]
 
-            amount_out = Web3.from_wei(resultSell[0][1], 'ether')
+    def round_trip(self, token, amount):
+        # leave the pinned state untouched for the next size or pair of the block
+        checkpoint = self.evm.snapshot()
+        try:
+            amount_token = self.buy(token, amount)
+            amount_out = Web3.from_wei(self.sell(token, amount_token), 'ether')
             slippage = (Decimal(amount) - Decimal(amount_out))/Decimal(amount)*Decimal(10000)
-            amount_token = Web3.from_wei(resultBuy[0][1], 'ether')
-            
-            return (amount, amount_out, slippage, amount_token)
+
+            return (amount, amount_out, slippage, Web3.from_wei(amount_token, 'ether'))
+        finally:
+            self.evm.revert(checkpoint)
+
+    def find_sell_failed_horizon(self, token, amount):
+        # sell restrictions armed after N blocks pass a simulation at the pinned block
+        checkpoint = self.evm.snapshot()
+        try:
+            amount_token = self.buy(token, amount)
+
+            for blocks in sorted(SIMULATION_HORIZON_BLOCKS):
+                timestamp = self.block_env.timestamp + blocks*BLOCK_TIME_SECONDS
+                self.evm.set_block_env(BlockEnv(
+                    number=self.block_env.number + blocks,
+                    timestamp=timestamp,
+                    basefee=self.block_env.basefee,
+                    gas_limit=self.block_env.gas_limit,
+                ))
+
+                horizon_checkpoint = self.evm.snapshot()
+                try:
+                    self.sell(token, amount_token, timestamp)
+                except Exception as e:
+                    logging.warning(f"SIMULATOR sell {token} fails {blocks} blocks ahead with error {e}")
+                    return blocks
+                finally:
+                    self.evm.revert(horizon_checkpoint)
+
+            return None
+        finally:
+            self.evm.set_block_env(self.block_env)
+            self.evm.revert(checkpoint)
+
+    def probe(self, action, amount) -> bool:
+        checkpoint = self.evm.snapshot()
+        try:
+            action(amount)
+            return True
+        except Exception:
+            return False
+        finally:
+            self.evm.revert(checkpoint)
+
+    def search_limit(self, action, low, high):
+        # low is known to succeed, None when even high succeeds
+        if self.probe(action, high):
+            return None
+
+        for _ in range(TRADE_LIMIT_SEARCH_STEPS):
+            middle = (low + high)/2
+            if self.probe(action, middle):
+                low = middle
+            else:
+                high = middle
+
+        return low
+
+    @timer_decorator
+    def find_trade_limits(self, token, amount):
+        # hidden maxTx limits revert real buys, every probe here is a local revert
+        max_buy_amount = self.search_limit(lambda amount_in: self.buy(token, amount_in), Decimal(amount), TRADE_LIMIT_SEARCH_MAX_AMOUNT)
+        max_sell_amount = self.search_limit(
+            lambda amount_in: self.sell(token, self.buy(token, amount_in)),
+            Decimal(amount),
+            max_buy_amount if max_buy_amount is not None else TRADE_LIMIT_SEARCH_MAX_AMOUNT,
+        )
+        if max_sell_amount is None and max_buy_amount is not None:
+            max_sell_amount = max_buy_amount
+
+        logging.debug(f"SIMULATOR trade limits of {token} buy {max_buy_amount} sell {max_sell_amount}")
+        return (max_buy_amount, max_sell_amount)
+
+    @timer_decorator
+    def inspect_token_by_swap(self, token, amount) -> None:
+        if self.evm is None:
+            self.pin_block(self.w3.eth.block_number)
+
+        try:
+            result = self.round_trip(token, amount)
         except Exception as e:
             logging.error(f"SIMULATOR inspect {token} failed with error {e}")
             return None
+
+        # taxes and max-tx limits often only bite at larger sizes
+        slippage_curve = [(amount, result[2])]
+        for ladder_amount in sorted(set(SIMULATION_LADDER) - {amount}):
+            try:
+                slippage_curve.append((ladder_amount, self.round_trip(token, ladder_amount)[2]))
+            except Exception as e:
+                logging.debug(f"SIMULATOR inspect {token} at {ladder_amount} failed with error {e}")
+                slippage_curve.append((ladder_amount, None))
+
+        try:
+            sell_failed_horizon = self.find_sell_failed_horizon(token, amount)
+        except Exception as e:
+            logging.error(f"SIMULATOR horizons of {token} failed with error {e}")
+            sell_failed_horizon = 0
+
+        trade_limits = (None, None)
+        if TRADE_LIMIT_SEARCH==1 and Decimal(amount) < TRADE_LIMIT_SEARCH_MAX_AMOUNT:
+            try:
+                trade_limits = self.find_trade_limits(token, amount)
+            except Exception as e:
+                logging.error(f"SIMULATOR trade limits of {token} failed with error {e}")
+
+        return (*result, sorted(slippage_curve, key=lambda point: point[0]), sell_failed_horizon, *trade_limits)
         
     def inspect_pair(self, pair: Pair, amount) -> None:
-        result = self.inspect_token_by_swap(pair.token, amount)
+        result = self.executor.submit(self.inspect_token_by_swap, pair.token, amount).result()
 
         if result is not None:
             return SimulationResult(
@@ -109,6 +264,10 @@ class RevmSimulator:
                 amount_out=result[1],
                 slippage=result[2],
                 amount_token=result[3],
+                slippage_curve=result[4],
+                sell_failed_horizon=result[5],
+                max_buy_amount=result[6],
+                max_sell_amount=result[7],
                 )
         
 if __name__ == '__main__':
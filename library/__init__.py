@@ -1 +1,8 @@
-from library.singleton import Singleton
\ No newline at end of file
+from library.singleton import Singleton
+from library.hedged_provider import HedgedHTTPProvider
+from library.reserve_cache import ReserveCache
+from library.balance_slot_cache import BalanceSlotCache
+from library.etherscan_client import EtherscanClient
+from library.tx_index import TxIndex
+from library.creator_blacklist import CreatorBlacklist
+from library.simulation_cache import SimulationCache
@@ -0,0 +1,67 @@
+import os
+import json
+import logging
+import tempfile
+import threading
+
+from library.singleton import Singleton
+
+BALANCE_SLOT_CACHE_FILE=os.environ.get('BALANCE_SLOT_CACHE_FILE', 'balance_slots.json')
+
+class BalanceSlotCache(metaclass=Singleton):
+    # token address or runtime code hash -> (slot index, storage layout)
+    def __init__(self, file_path=BALANCE_SLOT_CACHE_FILE) -> None:
+        self.file_path = file_path
+        self.slots = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        self.slots = {**self.slots, **self.read_file()}
+        logging.info(f"CACHE loaded {len(self.slots)} balance slots from {self.file_path}")
+
+    def read_file(self):
+        if self.file_path is None or not os.path.exists(self.file_path):
+            return {}
+
+        try:
+            with open(self.file_path, 'r') as readfile:
+                return {key: tuple(value) for key, value in json.load(readfile).items()}
+        except Exception as e:
+            logging.error(f"CACHE read balance slots {self.file_path} error {e}")
+            return {}
+
+    def get(self, key):
+        if key is None:
+            return None
+        return self.slots.get(key.lower())
+
+    def set(self, keys, slot):
+        with self.lock:
+            for key in keys:
+                if key is not None:
+                    self.slots[key.lower()] = tuple(slot)
+            self.save()
+
+    def save(self):
+        if self.file_path is None:
+            return
+
+        try:
+            # other processes may have written their own findings meanwhile
+            slots = {**self.read_file(), **self.slots}
+
+            # each writer gets its own temp file, inspection workers save concurrently
+            writefile = tempfile.NamedTemporaryFile('w', dir=os.path.dirname(os.path.abspath(self.file_path)), suffix='.tmp', delete=False)
+            try:
+                with writefile:
+                    json.dump(slots, writefile)
+                os.replace(writefile.name, self.file_path)
+            except Exception as e:
+                os.remove(writefile.name)
+                raise e
+        except Exception as e:
+            logging.error(f"CACHE save balance slots {self.file_path} error {e}")
+
+    def __len__(self) -> int:
+        return len(self.slots)
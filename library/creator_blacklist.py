@@ -0,0 +1,102 @@
+import os
+import math
+import time
+import hashlib
+import logging
+import threading
+
+from library.singleton import Singleton
+
+ROGUE_CREATOR_FROZEN_SECONDS=int(os.environ.get('ROGUE_CREATOR_FROZEN_SECONDS', '0'))
+BLACKLIST_MAX_AGE_DAYS=90
+BLACKLIST_BLOOM_CAPACITY=int(os.environ.get('BLACKLIST_BLOOM_CAPACITY', '0'))
+BLACKLIST_BLOOM_ERROR_RATE=0.001
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=BLACKLIST_BLOOM_ERROR_RATE) -> None:
+        self.size = max(8, int(-capacity*math.log(error_rate)/math.log(2)**2))
+        self.hashes = max(1, round(self.size/capacity*math.log(2)))
+        self.bits = bytearray((self.size + 7)//8)
+
+    def positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big')
+        return [(h1 + i*h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key) -> None:
+        for position in self.positions(key):
+            self.bits[position//8] |= 1 << (position % 8)
+
+    def __contains__(self, key) -> bool:
+        return all(self.bits[position//8] & (1 << (position % 8)) for position in self.positions(key))
+
+class CreatorBlacklist(metaclass=Singleton):
+    # creator address -> (frozen_at, created_at) as unix timestamps
+    def __init__(self, frozen_seconds=ROGUE_CREATOR_FROZEN_SECONDS, bloom_capacity=BLACKLIST_BLOOM_CAPACITY) -> None:
+        self.frozen_seconds = frozen_seconds
+        self.max_age_seconds = BLACKLIST_MAX_AGE_DAYS*86400
+        self.bloom_capacity = bloom_capacity
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.bloom = None
+        self.evicted = 0
+        self.rebuild_bloom()
+
+    def load(self, entries) -> None:
+        with self.lock:
+            for address, frozen_at, created_at in entries:
+                self.put(address, frozen_at, created_at)
+        logging.info(f"CACHE loaded {len(self.entries)} blacklisted creators")
+
+    def add(self, address) -> None:
+        now = time.time()
+        with self.lock:
+            # the reporter refreezes an existing entry and keeps its creation time
+            entry = self.entries.get(address.lower())
+            self.put(address, now, entry[1] if entry is not None else now)
+
+    def put(self, address, frozen_at, created_at) -> None:
+        self.entries[address.lower()] = (frozen_at, created_at)
+        if self.bloom is not None:
+            self.bloom.add(address.lower())
+
+    def is_active(self, entry, now) -> bool:
+        return entry[0] >= now - self.frozen_seconds and entry[1] >= now - self.max_age_seconds
+
+    def __contains__(self, address) -> bool:
+        if address is None:
+            return False
+
+        if self.bloom is not None and address.lower() not in self.bloom:
+            return False
+
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(address.lower())
+            if entry is None:
+                return False
+            if self.is_active(entry, now):
+                return True
+
+            self.entries.pop(address.lower())
+            self.evicted += 1
+            # expired bits only raise the false positive rate, so rebuild lazily
+            if self.bloom is not None and self.evicted > len(self.entries):
+                self.rebuild_bloom()
+            return False
+
+    def rebuild_bloom(self) -> None:
+        if self.bloom_capacity <= 0:
+            return
+
+        self.bloom = BloomFilter(max(self.bloom_capacity, len(self.entries)))
+        for address in self.entries:
+            self.bloom.add(address)
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __str__(self) -> str:
+        return f"CreatorBlacklist size {len(self.entries)} bloom {self.bloom is not None}"
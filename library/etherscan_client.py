@@ -0,0 +1,149 @@
+import os
+import time
+import logging
+import asyncio
+import threading
+from collections import OrderedDict
+
+import aiohttp
+
+from library.singleton import Singleton
+
+ETHERSCAN_RATE_LIMIT=float(os.environ.get('ETHERSCAN_RATE_LIMIT', '5'))
+ETHERSCAN_CACHE_TTL_SECONDS=int(os.environ.get('ETHERSCAN_CACHE_TTL_SECONDS', '30'))
+ETHERSCAN_TIMEOUT_SECONDS=int(os.environ.get('ETHERSCAN_TIMEOUT_SECONDS', '10'))
+ETHERSCAN_CACHE_CAPACITY=int(os.environ.get('ETHERSCAN_CACHE_CAPACITY', '10000'))
+ETHERSCAN_MAX_RETRIES=3
+ETHERSCAN_POOL_SIZE=20
+
+STATUS_CODE_SUCCESS=200
+RATE_LIMITED_MESSAGE='rate limit'
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None) -> None:
+        self.rate = rate
+        # a share of the rate below one request per second still has to fit one request
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at)*self.rate)
+        self.updated_at = now
+
+    def wait_time(self):
+        self.refill()
+        return 0 if self.tokens >= 1 else (1 - self.tokens)/self.rate
+
+    def take(self):
+        self.refill()
+        self.tokens -= 1
+
+    def drain(self):
+        # the server says this key is hot, back off for a full second
+        self.refill()
+        self.tokens = min(self.tokens, 1 - self.rate)
+
+class EtherscanClient(metaclass=Singleton):
+    def __init__(self, api_url, api_keys, rate_limit=ETHERSCAN_RATE_LIMIT, cache_ttl=ETHERSCAN_CACHE_TTL_SECONDS, cache_capacity=ETHERSCAN_CACHE_CAPACITY) -> None:
+        self.api_url = api_url
+        self.api_keys = api_keys.split(',') if isinstance(api_keys, str) else api_keys
+        self.buckets = {key: TokenBucket(rate_limit) for key in self.api_keys}
+        self.cache_ttl = cache_ttl
+        self.cache_capacity = cache_capacity
+
+        # key -> (expires_at or None, response), least recently used first
+        self.cache = OrderedDict()
+        self.inflight = {}
+        self.hits = 0
+        self.misses = 0
+
+        # inspections run in worker threads, requests share one loop and connection pool
+        self.loop = asyncio.new_event_loop()
+        self.session = None
+        self.bucket_lock = None
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    def get(self, params, cache_forever=None):
+        return asyncio.run_coroutine_threadsafe(self.fetch(params, cache_forever), self.loop).result()
+
+    async def fetch(self, params, cache_forever=None):
+        key = tuple(sorted(params.items()))
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            if cached[0] is None or cached[0] > time.monotonic():
+                self.hits += 1
+                self.cache.move_to_end(key)
+                return cached[1]
+            self.cache.pop(key)
+        self.misses += 1
+
+        # identical queries in flight share one request
+        if key in self.inflight:
+            return await asyncio.shield(self.inflight[key])
+
+        self.inflight[key] = self.loop.create_future()
+        try:
+            response = await self.request(params)
+
+            if response is not None:
+                expires_at = None if cache_forever is not None and cache_forever(response) else time.monotonic() + self.cache_ttl
+                self.cache[key] = (expires_at, response)
+                self.cache.move_to_end(key)
+                while len(self.cache) > self.cache_capacity:
+                    self.cache.popitem(last=False)
+
+            self.inflight[key].set_result(response)
+            return response
+        except Exception as e:
+            self.inflight[key].set_exception(e)
+            # coalesced callers still get it, a lone request must not leave it unretrieved
+            self.inflight[key].exception()
+            raise e
+        finally:
+            self.inflight.pop(key)
+
+    async def acquire_key(self):
+        if self.bucket_lock is None:
+            self.bucket_lock = asyncio.Lock()
+
+        async with self.bucket_lock:
+            api_key = min(self.api_keys, key=lambda api_key: self.buckets[api_key].wait_time())
+            wait_time = self.buckets[api_key].wait_time()
+            if wait_time > 0:
+                await asyncio.sleep(wait_time)
+            self.buckets[api_key].take()
+            return api_key
+
+    async def request(self, params):
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=ETHERSCAN_POOL_SIZE),
+                timeout=aiohttp.ClientTimeout(total=ETHERSCAN_TIMEOUT_SECONDS),
+            )
+
+        for attempt in range(ETHERSCAN_MAX_RETRIES):
+            api_key = await self.acquire_key()
+            try:
+                async with self.session.get(f"{self.api_url}/api", params={**params, 'apikey': api_key}) as r:
+                    if r.status != STATUS_CODE_SUCCESS:
+                        logging.error(f"ETHERSCAN {params.get('action')} error {r.status}")
+                        return None
+
+                    res = await r.json(content_type=None)
+                    if isinstance(res.get('result'), str) and RATE_LIMITED_MESSAGE in res['result'].lower():
+                        logging.warning(f"ETHERSCAN key #{self.api_keys.index(api_key)} rate limited, retry #{attempt + 1}")
+                        self.buckets[api_key].drain()
+                        continue
+
+                    return res
+            except asyncio.TimeoutError:
+                logging.error(f"ETHERSCAN {params.get('action')} timeout after {ETHERSCAN_TIMEOUT_SECONDS}s")
+                return None
+
+        return None
+
+    def __str__(self) -> str:
+        return f"EtherscanClient keys {len(self.api_keys)} cache {len(self.cache)} hits {self.hits} misses {self.misses}"
@@ -0,0 +1,119 @@
+import logging
+import time
+import threading
+import concurrent.futures
+from collections import deque
+
+from web3.providers import JSONBaseProvider, HTTPProvider
+
+LATENCY_WINDOW_SIZE=200
+MIN_LATENCY_SAMPLES=10
+DEFAULT_HEDGE_DELAY_SECONDS=0.3
+MIN_HEDGE_DELAY_SECONDS=0.02
+ERROR_PENALTY_SECONDS=1
+
+# state-changing requests must reach exactly one endpoint
+NON_HEDGED_METHODS=['eth_sendRawTransaction', 'eth_sendTransaction']
+
+class EndpointStats:
+    def __init__(self, endpoint_uri) -> None:
+        self.endpoint_uri = endpoint_uri
+        self.latencies = deque(maxlen=LATENCY_WINDOW_SIZE)
+        self.number_errors = 0
+        self.lock = threading.Lock()
+
+    def record(self, latency):
+        with self.lock:
+            self.latencies.append(latency)
+
+    def record_error(self):
+        with self.lock:
+            self.number_errors += 1
+            self.latencies.append(ERROR_PENALTY_SECONDS)
+
+    def percentile(self, percentage):
+        with self.lock:
+            if len(self.latencies) < MIN_LATENCY_SAMPLES:
+                return None
+            latencies = sorted(self.latencies)
+        return latencies[min(len(latencies)-1, int(len(latencies)*percentage/100))]
+
+    def score(self):
+        p50 = self.percentile(50)
+        return p50 if p50 is not None else 0
+
+    def __str__(self) -> str:
+        return f"Endpoint {self.endpoint_uri} p50 {self.percentile(50)} p95 {self.percentile(95)} errors {self.number_errors}"
+
+class HedgedHTTPProvider(JSONBaseProvider):
+    # latency stats are shared by every provider of the process
+    endpoint_stats = {}
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=32)
+    stats_lock = threading.Lock()
+
+    def __init__(self, endpoint_uris, request_kwargs=None) -> None:
+        if isinstance(endpoint_uris, str):
+            endpoint_uris = [uri.strip() for uri in endpoint_uris.split(',') if len(uri.strip())>0]
+
+        if len(endpoint_uris)==0:
+            raise Exception(f"at least one endpoint is required")
+
+        self.endpoint_uris = endpoint_uris
+        self.providers = {uri: HTTPProvider(uri, request_kwargs=request_kwargs) for uri in endpoint_uris}
+
+        with HedgedHTTPProvider.stats_lock:
+            for uri in endpoint_uris:
+                if uri not in HedgedHTTPProvider.endpoint_stats:
+                    HedgedHTTPProvider.endpoint_stats[uri] = EndpointStats(uri)
+
+        super().__init__()
+
+    def __str__(self) -> str:
+        return f"HedgedHTTPProvider {self.endpoint_uris}"
+
+    def ranked_endpoints(self):
+        return sorted(self.endpoint_uris, key=lambda uri: HedgedHTTPProvider.endpoint_stats[uri].score())
+
+    def hedge_delay(self, endpoint_uri):
+        p95 = HedgedHTTPProvider.endpoint_stats[endpoint_uri].percentile(95)
+        if p95 is None:
+            return DEFAULT_HEDGE_DELAY_SECONDS
+        return max(p95, MIN_HEDGE_DELAY_SECONDS)
+
+    def call_endpoint(self, endpoint_uri, method, params):
+        stats = HedgedHTTPProvider.endpoint_stats[endpoint_uri]
+        start_time = time.perf_counter()
+        try:
+            response = self.providers[endpoint_uri].make_request(method, params)
+        except Exception as e:
+            stats.record_error()
+            raise e
+
+        stats.record(time.perf_counter() - start_time)
+        return response
+
+    def make_request(self, method, params):
+        ranked = self.ranked_endpoints()
+
+        if len(ranked)==1 or method in NON_HEDGED_METHODS:
+            return self.call_endpoint(ranked[0], method, params)
+
+        primary = HedgedHTTPProvider.executor.submit(self.call_endpoint, ranked[0], method, params)
+        done, _ = concurrent.futures.wait([primary], timeout=self.hedge_delay(ranked[0]))
+        if len(done)>0 and primary.exception() is None:
+            return primary.result()
+
+        logging.debug(f"PROVIDER hedge {method} to {ranked[1]} after primary {ranked[0]} stalled or failed")
+        futures = [primary, HedgedHTTPProvider.executor.submit(self.call_endpoint, ranked[1], method, params)]
+
+        error = None
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                return future.result()
+            except Exception as e:
+                error = e
+
+        raise error
+
+    def is_connected(self, show_traceback=False) -> bool:
+        return any([provider.is_connected(show_traceback) for provider in self.providers.values()])
@@ -0,0 +1,97 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from library.singleton import Singleton
+
+RESERVE_CACHE_CAPACITY=int(os.environ.get('RESERVE_CACHE_CAPACITY', '5000'))
+RESERVE_CACHE_MAX_AGE_HOURS=float(os.environ.get('RESERVE_CACHE_MAX_AGE_HOURS', '24'))
+
+class ReserveState:
+    def __init__(self, pair_address, created_at, reserve0=0, reserve1=0, block_number=0) -> None:
+        self.pair_address = pair_address
+        self.created_at = created_at
+        self.reserve0 = reserve0
+        self.reserve1 = reserve1
+        self.block_number = block_number
+
+    def reserves(self, token_index):
+        # (reserve_token, reserve_eth) in wei
+        return (self.reserve0, self.reserve1) if token_index == 0 else (self.reserve1, self.reserve0)
+
+    def __str__(self) -> str:
+        return f"ReserveState {self.pair_address} reserve0 {self.reserve0} reserve1 {self.reserve1} block #{self.block_number}"
+
+class ReserveCache(metaclass=Singleton):
+    def __init__(self, capacity=RESERVE_CACHE_CAPACITY, max_age_hours=RESERVE_CACHE_MAX_AGE_HOURS) -> None:
+        self.capacity = capacity
+        self.max_age_seconds = max_age_hours*3600
+        self.states = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def track(self, pair_address, created_at, reserve0=0, reserve1=0, block_number=0):
+        with self.lock:
+            self.states[pair_address.lower()] = ReserveState(pair_address, created_at, reserve0, reserve1, block_number)
+            self.states.move_to_end(pair_address.lower())
+            while len(self.states) > self.capacity:
+                self.states.popitem(last=False)
+
+    def update(self, pair_address, reserve0, reserve1, block_number) -> bool:
+        with self.lock:
+            state = self.states.get(pair_address.lower())
+            # re-applied canonical blocks after a reorg carry the same block number
+            if state is None or block_number < state.block_number:
+                return False
+
+            state.reserve0 = reserve0
+            state.reserve1 = reserve1
+            state.block_number = block_number
+            self.states.move_to_end(pair_address.lower())
+            return True
+
+    def snapshot(self, pair_address):
+        with self.lock:
+            state = self.states.get(pair_address.lower())
+            return (state.reserve0, state.reserve1, state.block_number) if state is not None else None
+
+    def restore(self, pair_address, snapshot) -> None:
+        # undoes an orphaned block, reserves may move back to an older block
+        with self.lock:
+            state = self.states.get(pair_address.lower())
+            if state is None:
+                return
+            if snapshot is None:
+                self.states.pop(pair_address.lower())
+                return
+            state.reserve0, state.reserve1, state.block_number = snapshot
+
+    def get(self, pair_address) -> ReserveState:
+        with self.lock:
+            state = self.states.get(pair_address.lower())
+            if state is not None and state.created_at < time.time() - self.max_age_seconds:
+                self.states.pop(pair_address.lower())
+                state = None
+
+            if state is None or state.block_number == 0:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.states.move_to_end(pair_address.lower())
+            return state
+
+    def addresses(self):
+        expired_at = time.time() - self.max_age_seconds
+        with self.lock:
+            for address in [address for address, state in self.states.items() if state.created_at < expired_at]:
+                self.states.pop(address)
+            return [state.pair_address for state in self.states.values()]
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def __str__(self) -> str:
+        return f"ReserveCache size {len(self.states)} hits {self.hits} misses {self.misses}"
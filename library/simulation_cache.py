@@ -0,0 +1,77 @@
+import os
+import time
+import threading
+import concurrent.futures
+from collections import OrderedDict
+
+from library.singleton import Singleton
+
+SIMULATION_CACHE_CAPACITY=int(os.environ.get('SIMULATION_CACHE_CAPACITY', '5000'))
+SIMULATION_CACHE_TTL_SECONDS=int(os.environ.get('SIMULATION_CACHE_TTL_SECONDS', '300'))
+
+class SimulationCache(metaclass=Singleton):
+    # key -> (expires_at, verdict), failed simulations are not cached so they get retried
+    def __init__(self, capacity=SIMULATION_CACHE_CAPACITY, ttl=SIMULATION_CACHE_TTL_SECONDS) -> None:
+        self.capacity = capacity
+        self.ttl = ttl
+        self.verdicts = OrderedDict()
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def put(self, key, verdict) -> None:
+        if verdict is None:
+            return
+
+        with self.lock:
+            self.verdicts[key] = (time.time() + self.ttl, verdict)
+            self.verdicts.move_to_end(key)
+            while len(self.verdicts) > self.capacity:
+                self.verdicts.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        with self.lock:
+            entry = self.verdicts.get(key)
+            if entry is not None and entry[0] > time.time():
+                self.hits += 1
+                self.verdicts.move_to_end(key)
+                return entry[1]
+
+            # concurrent requests for the same key wait on the first one
+            future = self.inflight.get(key)
+            is_owner = future is None
+            if is_owner:
+                self.misses += 1
+                future = concurrent.futures.Future()
+                self.inflight[key] = future
+            else:
+                self.coalesced += 1
+
+        if not is_owner:
+            return future.result()
+
+        try:
+            verdict = compute()
+        except Exception as e:
+            with self.lock:
+                self.inflight.pop(key)
+            future.set_exception(e)
+            raise e
+
+        self.put(key, verdict)
+        with self.lock:
+            self.inflight.pop(key)
+        future.set_result(verdict)
+        return verdict
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses + self.coalesced
+        return (self.hits + self.coalesced)/total if total > 0 else 0
+
+    def __len__(self) -> int:
+        return len(self.verdicts)
+
+    def __str__(self) -> str:
+        return f"SimulationCache size {len(self.verdicts)} hits {self.hits} coalesced {self.coalesced} misses {self.misses} hit rate {self.hit_rate():.2%}"
@@ -0,0 +1,65 @@
+import os
+import threading
+from collections import OrderedDict
+
+from library.singleton import Singleton
+
+TX_INDEX_CAPACITY=int(os.environ.get('TX_INDEX_CAPACITY', '2000'))
+
+class TokenTxHistory:
+    def __init__(self, token, creation_block, is_provisional=False) -> None:
+        self.token = token
+        self.creation_block = creation_block
+        # creation not indexed by etherscan yet, scanning started from a fallback block
+        self.is_provisional = is_provisional
+        self.last_block = creation_block - 1
+        # tx hash -> etherscan txlist entry
+        self.txs = OrderedDict()
+
+    def merge(self, txs, to_block) -> None:
+        for tx in txs:
+            self.txs[tx['hash']] = tx
+        self.last_block = max(self.last_block, to_block)
+
+    def between(self, from_block, to_block):
+        return [tx for tx in self.txs.values() if from_block <= int(tx['blockNumber']) <= to_block]
+
+    def __str__(self) -> str:
+        return f"TokenTxHistory {self.token} created #{self.creation_block} provisional {self.is_provisional} scanned to #{self.last_block} txs {len(self.txs)}"
+
+class TxIndex(metaclass=Singleton):
+    def __init__(self, capacity=TX_INDEX_CAPACITY) -> None:
+        self.capacity = capacity
+        self.histories = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, token) -> TokenTxHistory:
+        with self.lock:
+            history = self.histories.get(token.lower())
+            if history is not None:
+                self.histories.move_to_end(token.lower())
+            return history
+
+    def track(self, token, creation_block, is_provisional=False) -> TokenTxHistory:
+        with self.lock:
+            history = self.histories.get(token.lower())
+            # the real creation block replaces a fallback, earlier blocks were never scanned
+            if history is None or (history.is_provisional and not is_provisional):
+                history = TokenTxHistory(token, creation_block, is_provisional)
+                self.histories[token.lower()] = history
+                while len(self.histories) > self.capacity:
+                    self.histories.popitem(last=False)
+            self.histories.move_to_end(token.lower())
+            return history
+
+    def merge(self, token, txs, to_block) -> None:
+        with self.lock:
+            history = self.histories.get(token.lower())
+            if history is not None:
+                history.merge(txs, to_block)
+
+    def __len__(self) -> int:
+        return len(self.histories)
+
+    def __str__(self) -> str:
+        return f"TxIndex size {len(self.histories)}"
@@ -13,7 +13,7 @@ import logging
 from decimal import Decimal
 from time import time
 from datetime import datetime, timedelta
-from typing import List
+from typing import List, Tuple
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -24,21 +24,27 @@ from watcher import BlockWatcher
 from inspector import PairInspector
 from executor import BuySellExecutor
 from reporter import Reporter
-from helpers import load_abi, timer_decorator, calculate_price, calculate_next_block_base_fee, \
+from library import ReserveCache
+from library.etherscan_client import ETHERSCAN_RATE_LIMIT
+from helpers import load_abi, timer_decorator, async_timer_decorator, calculate_price, calculate_next_block_base_fee, \
                         constants, get_hour_in_vntz, calculate_expect_pnl, determine_epoch
 
 from data import ExecutionOrder, SimulationResult, ExecutionAck, Position, TxStatus, \
                     ReportData, ReportDataType, BlockData, Pair, MaliciousPair, InspectionResult, \
-                    ControlOrder, ControlOrderType
+                    ControlOrder, ControlOrderType, PendingPair, Inventory, \
+                    InspectionOrder, InspectionOrderType, InspectionAck
 
 # global variables
 glb_fullfilled = 0
 glb_liquidated = False
 glb_watchlist = []
-glb_inventory = []
+glb_inventory = Inventory()
 glb_daily_pnl = (datetime.now(), 0)
 glb_auto_run = True
 glb_lock = threading.Lock()
+glb_inspection_brokers = []
+glb_inspection_futures = {}
+glb_inspection_counter = 0
 
 # load config
 ERC20_ABI = load_abi(f"{os.path.dirname(__file__)}/contracts/abis/ERC20.abi.json")
@@ -83,7 +89,14 @@ STOP_LOSS_PERCENTAGE=float(os.environ.get('STOP_LOSS_PERCENTAGE'))
 HOLD_MAX_DURATION_SECONDS=int(os.environ.get('HOLD_MAX_DURATION_SECONDS'))
 HARD_STOP_PNL_THRESHOLD=int(os.environ.get('HARD_STOP_PNL_THRESHOLD'))
 
-async def watching_process(watching_broker, watching_notifier):
+# mempool config
+MEMPOOL_QUEUE_SIZE=int(os.environ.get('MEMPOOL_QUEUE_SIZE', '100'))
+TRADE_LIMIT_SAFETY_RATIO=float(os.environ.get('TRADE_LIMIT_SAFETY_RATIO', '0.9'))
+ORDER_SLIPPAGE_MAX_THRESHOLD=float(os.environ.get('ORDER_SLIPPAGE_MAX_THRESHOLD', '300')) # in basis points
+INSPECTION_WORKERS=int(os.environ.get('INSPECTION_WORKERS', '2'))
+INSPECTION_TIMEOUT_SECONDS=int(os.environ.get('INSPECTION_TIMEOUT_SECONDS', '60'))
+
+async def watching_process(watching_broker, watching_notifier, mempool_broker):
     block_watcher = BlockWatcher(os.environ.get('HTTPS_URL'),
                                 os.environ.get('WSS_URL'), 
                                 watching_broker, 
@@ -92,9 +105,25 @@ async def watching_process(watching_broker, watching_notifier):
                                 FACTORY_ABI,
                                 os.environ.get('WETH_ADDRESS'),
                                 PAIR_ABI,
+                                mempool_broker,
+                                Web3.to_checksum_address(os.environ.get('ROUTER_ADDRESS')),
+                                ROUTER_ABI,
                                 )
     await block_watcher.main()
 
+async def prewarming_process(mempool_broker):
+    while True:
+        pending_pair = await mempool_broker.coro_get()
+        if pending_pair is not None and isinstance(pending_pair, PendingPair):
+            if RUN_MODE==constants.WATCHING_ONLY_MODE:
+                continue
+
+            # warm the worker that will later inspect this token
+            select_inspection_broker(pending_pair.token).put(InspectionOrder(
+                type=InspectionOrderType.PREWARM,
+                data=pending_pair,
+            ))
+
 async def strategy(watching_broker, execution_broker, report_broker, watching_notifier,):
     global glb_fullfilled
     global glb_liquidated
@@ -106,24 +135,57 @@ async def strategy(watching_broker, execution_broker, report_broker, watching_no
     global BUY_AMOUNT
 
     def calculate_pnl_percentage(position, pair):        
-        numerator = Decimal(position.amount)*calculate_price(pair.reserve_token, pair.reserve_eth) - Decimal(BUY_AMOUNT) - Decimal(GAS_COST)
-        denominator = Decimal(BUY_AMOUNT)
+        # orders clamped to a token's trade limit are smaller than the buy-amount
+        amount_in = position.amount_in if position.amount_in is not None else BUY_AMOUNT
+        numerator = Decimal(position.amount)*calculate_price(pair.reserve_token, pair.reserve_eth) - Decimal(amount_in) - Decimal(GAS_COST)
+        denominator = Decimal(amount_in)
         return (numerator / denominator) * Decimal(100)
     
-    def send_exec_order(block_data, pair, is_paper=False):
+    def size_by_slippage(amount_in, simulation_result):
+        # the largest simulated size up to amount_in whose round trip stays under the slippage limit
+        curve = simulation_result.slippage_curve if simulation_result is not None else []
+        if len(curve)==0:
+            return amount_in
+
+        slippage = simulation_result.slippage_at(amount_in)
+        if slippage is not None and slippage < ORDER_SLIPPAGE_MAX_THRESHOLD:
+            return amount_in
+
+        # beyond the ladder the largest simulated size is the best estimate
+        if amount_in > curve[-1][0] and curve[-1][1] is not None and curve[-1][1] < ORDER_SLIPPAGE_MAX_THRESHOLD:
+            return amount_in
+
+        sizes = [size for size, slippage in curve if size < amount_in and slippage is not None and slippage < ORDER_SLIPPAGE_MAX_THRESHOLD]
+        return sizes[-1] if len(sizes)>0 else 0
+
+    def send_exec_order(block_data, pair, is_paper=False, max_amount_in=None, simulation_result=None):
         global glb_fullfilled
 
+        amount_in = BUY_AMOUNT
+        if max_amount_in is not None and float(max_amount_in)*TRADE_LIMIT_SAFETY_RATIO < BUY_AMOUNT:
+            amount_in = round(float(max_amount_in)*TRADE_LIMIT_SAFETY_RATIO, 6)
+            logging.warning(f"MAIN clamp buy-amount of {pair.address} to {amount_in} due to trade limit {max_amount_in}")
+
+        sized_amount_in = size_by_slippage(amount_in, simulation_result)
+        if sized_amount_in < amount_in:
+            amount_in = sized_amount_in
+            logging.warning(f"MAIN clamp buy-amount of {pair.address} to {amount_in} due to slippage curve {simulation_result.slippage_curve}")
+
+        if amount_in < MIN_BUY_AMOUNT:
+            logging.warning(f"MAIN pair {pair.address} not qualified for execution due to buy-amount {amount_in} below min buy-amount {MIN_BUY_AMOUNT}")
+            return
+
         if glb_fullfilled < INVENTORY_CAPACITY:
             with glb_lock:
                 glb_fullfilled += 1
 
             # send execution order
-            logging.warning(f"MAIN send buy-order of {pair.address} amount {BUY_AMOUNT}")
+            logging.warning(f"MAIN send buy-order of {pair.address} amount {amount_in}")
             execution_broker.put(ExecutionOrder(
                 block_number=block_data.block_number,
                 block_timestamp=block_data.block_timestamp,
                 pair=pair,
-                amount_in=BUY_AMOUNT,
+                amount_in=amount_in,
                 amount_out_min=0,
                 is_buy=True,
                 is_paper=is_paper,
@@ -131,6 +193,136 @@ async def strategy(watching_broker, execution_broker, report_broker, watching_no
         else:
             logging.warning(f"MAIN inventory capacity {INVENTORY_CAPACITY} is full")
 
+    async def inspect_block(block_data, new_pairs, watchlist_updates):
+        # returns the new pairs whose inspection timed out
+        timed_out_pairs = []
+        try:
+            if len(glb_watchlist)>0:
+                logging.info(f"MAIN watching list {len(glb_watchlist)}")
+
+                # swap counts decoded by the watcher from block receipts
+                for tracked in watchlist_updates:
+                    for pair in glb_watchlist:
+                        if pair.address == tracked.address:
+                            with glb_lock:
+                                pair.number_tx_mm = tracked.number_tx_mm
+
+                inspection_batch=[]
+                for pair in glb_watchlist:
+                    if (block_data.block_timestamp - pair.created_at) > pair.inspect_attempts*INSPECT_INTERVAL_SECONDS:
+                        logging.warning(f"MAIN pair {pair.address} inspect time #{pair.inspect_attempts + 1} elapsed")
+
+                        # latest reserves are kept locally from Sync events
+                        state = ReserveCache().get(pair.address)
+                        if state is not None:
+                            reserve_token, reserve_eth = state.reserves(pair.token_index)
+                            with glb_lock:
+                                pair.reserve_token = Web3.from_wei(reserve_token, 'ether')
+                                pair.reserve_eth = Web3.from_wei(reserve_eth, 'ether')
+
+                        inspection_batch.append(pair)
+
+                if len(inspection_batch)>0:
+                    results, timed_out = await inspect(inspection_batch, block_data.block_number)
+                    logging.debug(f"MAIN watchlist simulation result length {len(results)}")
+                    results_by_address = {result.pair.address: result for result in results if result.simulation_result is not None}
+
+                    for result in results:
+                        if result.simulation_result is not None:
+                            for idx,pair in enumerate(glb_watchlist):
+                                if result.pair.address == pair.address:
+                                    with glb_lock:
+                                        pair.inspect_attempts += 1
+                                        pair.number_tx_mm = result.number_tx_mm
+                                        pair.contract_verified = result.contract_verified if not pair.contract_verified else pair.contract_verified
+                                        # TODO: last_inspected_block is not updated and stay as initial value created_block_number
+                                        # in order to re-verify multiple times to gain reliability
+                                        #pair.last_inspected_block = block_data.block_number
+                                
+                                    logging.warning(f"MAIN update upon inspect attempts {pair}")
+
+                                if pair.inspect_attempts >= MAX_INSPECT_ATTEMPTS:
+                                    with glb_lock:
+                                        glb_watchlist.pop(idx)
+                                    logging.warning(f"MAIN remove pair {pair.address} from watching list at index #{idx} caused by reaching max attempts {MAX_INSPECT_ATTEMPTS}")
+
+                                    pair_result = results_by_address.get(pair.address)
+                                    if pair_result is None:
+                                        logging.warning(f"MAIN pair {pair.address} not qualified for execution due to no inspection result in block #{block_data.block_number}")
+                                    elif pair.number_tx_mm >= NUMBER_TX_MM_THRESHOLD and pair.contract_verified:
+                                        is_paper = True if RUN_MODE==constants.PAPER_TRADE_MODE else False
+                                        send_exec_order(block_data,pair,is_paper,pair_result.max_amount_in,pair_result.simulation_result)
+                                    else:
+                                        logging.warning(f"MAIN pair {pair.address} not qualified for execution due to numberTxMM {pair.number_tx_mm} is not sufficient or contract unverified")
+
+                    # remove simulation failed pair, timed out ones stay to be inspected again
+                    failed_pairs = [pair.address for pair in inspection_batch if pair.address not in [result.simulation_result.pair.address for result in results if result.simulation_result is not None] and pair not in timed_out]
+                    for idx,pair in enumerate(glb_watchlist):
+                        if pair.address in failed_pairs:
+                            with glb_lock:
+                                glb_watchlist.pop(idx)
+
+                            logging.warning(f"MAIN remove pair {pair.address} from watchlist at index #{idx} due to inspection failed")
+
+            if  len(new_pairs)>0:
+                results, timed_out_pairs = await inspect(new_pairs, block_data.block_number, is_initial=True)
+                logging.debug(f"MAIN inspection results length {len(results)}")
+
+                if len(glb_watchlist)<WATCHLIST_CAPACITY:
+                    for result in results:
+                        if result.simulation_result is not None:
+                            if MAX_INSPECT_ATTEMPTS > 1:
+                                with glb_lock:
+                                    # append to watchlist
+                                    pair=result.pair
+                                    pair.inspect_attempts=1
+                                    pair.last_inspected_block=block_data.block_number
+                                    pair.contract_verified=result.contract_verified
+                                    pair.number_tx_mm=result.number_tx_mm
+
+                                    glb_watchlist.append(pair)
+
+                                logging.warning(f"MAIN add pair {pair.address} to watchlist length {len(glb_watchlist)}")
+                            else:
+                                # send order immediately
+                                send_exec_order(block_data, result.pair, max_amount_in=result.max_amount_in, simulation_result=result.simulation_result)
+                else:
+                    logging.warning(f"MAIN watchlist is already full capacity")
+        except Exception as e:
+            logging.error(f"MAIN inspect block #{block_data.block_number} error {e}")
+
+        return timed_out_pairs
+
+    queued_blocks = []
+    inspection_ready = asyncio.Event()
+
+    async def run_inspections():
+        # one block at a time, a watchlist pair is never inspected twice concurrently
+        requeued_pairs = []
+        while True:
+            await inspection_ready.wait()
+            inspection_ready.clear()
+
+            # the latest block supersedes the queued ones, only their new pairs are carried over
+            block_data = queued_blocks[-1]
+            if len(queued_blocks)>1:
+                logging.warning(f"MAIN inspection of blocks {[queued.block_number for queued in queued_blocks[:-1]]} superseded by #{block_data.block_number}")
+
+            new_pairs = {}
+            for pair in requeued_pairs + [pair for queued in queued_blocks for pair in queued.pairs]:
+                new_pairs.setdefault(pair.address, pair)
+            watchlist_updates = [tracked for queued in queued_blocks for tracked in queued.watchlist]
+            queued_blocks.clear()
+
+            timed_out_pairs = await inspect_block(block_data, list(new_pairs.values()), watchlist_updates)
+
+            # a pair gets one more chance with the next block, requeued pairs timing out again are dropped
+            for pair in [pair for pair in timed_out_pairs if pair in requeued_pairs]:
+                logging.warning(f"MAIN drop pair {pair.address} after its inspection timed out twice")
+            requeued_pairs = [pair for pair in timed_out_pairs if pair not in requeued_pairs]
+
+    inspection_runner = asyncio.ensure_future(run_inspections())
+
     while True:
         block_data = await watching_broker.coro_get()
         logging.info(f"MAIN received block {block_data}")
@@ -151,17 +343,16 @@ async def strategy(watching_broker, execution_broker, report_broker, watching_no
 
         if len(glb_inventory)>0:
             if not glb_liquidated:
-                for idx,position in enumerate(glb_inventory):
+                for position in glb_inventory:
                     is_liquidated = False
-                    for pair in block_data.inventory:
-                        if position.pair.address == pair.address:
-                            position.pnl = calculate_pnl_percentage(position, pair)
-                            logging.warning(f"MAIN {position} update PnL {position.pnl}")
-                            
-                            if position.pnl > Decimal(TAKE_PROFIT_PERCENTAGE) or position.pnl < Decimal(STOP_LOSS_PERCENTAGE):
-                                logging.warning(f"MAIN {position} take profit or stop loss caused by pnl {position.pnl}")
-                                is_liquidated = True
-                                break
+                    pair = block_data.inventory.get(position.pair.address)
+                    if pair is not None:
+                        position.pnl = calculate_pnl_percentage(position, pair)
+                        logging.warning(f"MAIN {position} update PnL {position.pnl}")
+                        
+                        if position.pnl > Decimal(TAKE_PROFIT_PERCENTAGE) or position.pnl < Decimal(STOP_LOSS_PERCENTAGE):
+                            logging.warning(f"MAIN {position} take profit or stop loss caused by pnl {position.pnl}")
+                            is_liquidated = True
 
                     if not is_liquidated and block_data.block_timestamp - position.start_time > HOLD_MAX_DURATION_SECONDS:
                         logging.warning(f"MAIN {position} liquidation call caused by timeout {HOLD_MAX_DURATION_SECONDS}")
@@ -170,8 +361,8 @@ async def strategy(watching_broker, execution_broker, report_broker, watching_no
                     if is_liquidated:
                         with glb_lock:
                             glb_liquidated = True
-                            glb_inventory.pop(idx)
-                        logging.warning(f"MAIN Remove {position} from inventory at index #{idx}")
+                            glb_inventory.remove(position.pair.address)
+                        logging.warning(f"MAIN Remove {position} from inventory")
 
                         execution_broker.put(ExecutionOrder(
                                     block_number=block_data.block_number,
@@ -183,6 +374,7 @@ async def strategy(watching_broker, execution_broker, report_broker, watching_no
                                     signer=position.signer,
                                     bot=position.bot,
                                     is_paper=position.is_paper,
+                                    buy_amount=position.amount_in,
                                 ))
         
         if glb_daily_pnl[1] < HARD_STOP_PNL_THRESHOLD and glb_auto_run:
@@ -205,82 +397,12 @@ async def strategy(watching_broker, execution_broker, report_broker, watching_no
                     BUY_AMOUNT=float(os.environ.get('BUY_AMOUNT'))
                     logging.warning(f"MAIN reset buy-amount to initial value {BUY_AMOUNT} at 0 a.m VNT")
 
-        if len(glb_watchlist)>0:
-            logging.info(f"MAIN watching list {len(glb_watchlist)}")
-
-            inspection_batch=[]
-            for pair in glb_watchlist:
-                if (block_data.block_timestamp - pair.created_at) > pair.inspect_attempts*INSPECT_INTERVAL_SECONDS:
-                    logging.warning(f"MAIN pair {pair.address} inspect time #{pair.inspect_attempts + 1} elapsed")
-                    inspection_batch.append(pair)
-
-            if len(inspection_batch)>0:
-                results = inspect(inspection_batch, block_data.block_number)
-                logging.debug(f"MAIN watchlist simulation result length {len(results)}")
-
-                for result in results:
-                    if result.simulation_result is not None:
-                        for idx,pair in enumerate(glb_watchlist):
-                            if result.pair.address == pair.address:
-                                with glb_lock:
-                                    pair.inspect_attempts += 1
-                                    pair.number_tx_mm = result.number_tx_mm
-                                    pair.contract_verified = result.contract_verified if not pair.contract_verified else pair.contract_verified
-                                    # TODO: last_inspected_block is not updated and stay as initial value created_block_number
-                                    # in order to re-verify multiple times to gain reliability
-                                    #pair.last_inspected_block = block_data.block_number
-                                    
-                                logging.warning(f"MAIN update upon inspect attempts {pair}")
-
-                            if pair.inspect_attempts >= MAX_INSPECT_ATTEMPTS:
-                                with glb_lock:
-                                    glb_watchlist.pop(idx)
-                                logging.warning(f"MAIN remove pair {pair.address} from watching list at index #{idx} caused by reaching max attempts {MAX_INSPECT_ATTEMPTS}")
-
-                                if pair.number_tx_mm >= NUMBER_TX_MM_THRESHOLD and pair.contract_verified:
-                                    is_paper = True if RUN_MODE==constants.PAPER_TRADE_MODE else False
-                                    send_exec_order(block_data,pair,is_paper)                                    
-                                else:
-                                    logging.warning(f"MAIN pair {pair.address} not qualified for execution due to numberTxMM {pair.number_tx_mm} is not sufficient or contract unverified")
-
-                # remove simulation failed pair
-                failed_pairs = [pair.address for pair in inspection_batch if pair.address not in [result.simulation_result.pair.address for result in results if result.simulation_result is not None]]
-                for idx,pair in enumerate(glb_watchlist):
-                    if pair.address in failed_pairs:
-                        with glb_lock:
-                            glb_watchlist.pop(idx)
-
-                        logging.warning(f"MAIN remove pair {pair.address} from watchlist at index #{idx} due to inspection failed")
+        # inspections run as their own task, so exits above are checked on every block
+        queued_blocks.append(block_data)
+        inspection_ready.set()
 
-        if  len(block_data.pairs)>0:
-            results = inspect(block_data.pairs, block_data.block_number, is_initial=True)
-            logging.debug(f"MAIN inspection results length {len(results)}")
-
-            if len(glb_watchlist)<WATCHLIST_CAPACITY:
-                for result in results:
-                    if result.simulation_result is not None:
-                        if MAX_INSPECT_ATTEMPTS > 1:
-                            with glb_lock:
-                                # append to watchlist
-                                pair=result.pair
-                                pair.inspect_attempts=1
-                                pair.last_inspected_block=block_data.block_number
-                                pair.contract_verified=result.contract_verified
-                                pair.number_tx_mm=result.number_tx_mm
-
-                                glb_watchlist.append(pair)
-
-                            logging.warning(f"MAIN add pair {pair.address} to watchlist length {len(glb_watchlist)}")
-                        else:
-                            # send order immediately
-                            send_exec_order(block_data, result.pair)
-            else:
-                logging.warning(f"MAIN watchlist is already full capacity")
-
-@timer_decorator
-def inspect(pairs, block_number, is_initial=False) -> List[InspectionResult]:
-
-    inspector = PairInspector(
+def create_inspector(etherscan_rate_limit=ETHERSCAN_RATE_LIMIT) -> PairInspector:
+    return PairInspector(
         http_url=os.environ.get('HTTPS_URL'),
         api_keys=os.environ.get('BASESCAN_API_KEYS'),
         etherscan_api_url=os.environ.get('ETHERSCAN_API_URL'),
@@ -291,9 +413,76 @@ def inspect(pairs, block_number, is_initial=False) -> List[InspectionResult]:
         pair_abi=PAIR_ABI,
         weth_abi=WETH_ABI,
         bot_abi=BOT_ABI,
+        etherscan_rate_limit=etherscan_rate_limit,
     )
 
-    return inspector.inspect_batch(pairs,block_number, is_initial)
+def select_inspection_broker(token):
+    # a token always lands on the same worker, so its caches stay warm across attempts
+    return glb_inspection_brokers[int(token, 16) % len(glb_inspection_brokers)]
+
+@async_timer_decorator
+async def inspect(pairs, block_number, is_initial=False) -> Tuple[List[InspectionResult], List[Pair]]:
+    global glb_inspection_counter
+
+    shards = {}
+    for pair in pairs:
+        shards.setdefault(select_inspection_broker(pair.token), []).append(pair)
+
+    futures = {}
+    for inspection_broker, shard in shards.items():
+        glb_inspection_counter += 1
+        future = asyncio.get_running_loop().create_future()
+        glb_inspection_futures[glb_inspection_counter] = future
+        futures[future] = shard
+
+        inspection_broker.put(InspectionOrder(
+            type=InspectionOrderType.INSPECT,
+            data=(shard, block_number, is_initial),
+            order_id=glb_inspection_counter,
+        ))
+
+    done, pending = await asyncio.wait(futures, timeout=INSPECTION_TIMEOUT_SECONDS)
+    if len(pending)>0:
+        logging.error(f"MAIN {len(pending)} inspection orders of block #{block_number} timed out after {INSPECTION_TIMEOUT_SECONDS}s")
+        for order_id in [order_id for order_id, future in glb_inspection_futures.items() if future in pending]:
+            glb_inspection_futures.pop(order_id)
+
+    return [result for future in done for result in future.result()], [pair for future in pending for pair in futures[future]]
+
+async def handle_inspection_report(inspection_report):
+    while True:
+        ack = await inspection_report.coro_get()
+
+        if ack is not None and isinstance(ack, InspectionAck):
+            future = glb_inspection_futures.pop(ack.order_id, None)
+            if future is not None and not future.done():
+                future.set_result(ack.results)
+
+def inspection_process(inspection_broker, inspection_report):
+    # set process group the same as main process
+    os.setpgid(0, os.getppid())
+
+    # each worker keeps its own warm inspector and simulator, the per-key etherscan rate is split between them
+    inspector = create_inspector(etherscan_rate_limit=ETHERSCAN_RATE_LIMIT/INSPECTION_WORKERS)
+
+    while True:
+        order = inspection_broker.get()
+        if order is None or not isinstance(order, InspectionOrder):
+            continue
+
+        try:
+            if order.type==InspectionOrderType.INSPECT:
+                pairs, block_number, is_initial = order.data
+                results = inspector.inspect_batch(pairs, block_number, is_initial)
+                inspection_report.put(InspectionAck(order.order_id, results))
+            elif order.type==InspectionOrderType.PREWARM:
+                inspector.prewarm(order.data)
+            elif order.type==InspectionOrderType.BLACKLIST_ADDED:
+                inspector.add_blacklist(order.data)
+        except Exception as e:
+            logging.error(f"MAIN inspection order {order} error {e}")
+            if order.type==InspectionOrderType.INSPECT:
+                inspection_report.put(InspectionAck(order.order_id, []))
 
 def execution_process(execution_broker, report_broker):
     # set process group the same as main process
@@ -336,6 +525,7 @@ async def main():
     execution_report = aioprocessing.AioQueue()
     report_broker = aioprocessing.AioQueue()
     control_receiver = aioprocessing.AioQueue()
+    mempool_broker = aioprocessing.AioQueue(MEMPOOL_QUEUE_SIZE)
 
     # set process group
     os.setpgid(0, 0)
@@ -344,6 +534,14 @@ async def main():
     p2 = Process(target=execution_process, args=(execution_broker,execution_report,))
     p2.start()
 
+    # INSPECTION processes
+    inspection_report = aioprocessing.AioQueue()
+    if RUN_MODE!=constants.WATCHING_ONLY_MODE:
+        for _ in range(INSPECTION_WORKERS):
+            inspection_broker = aioprocessing.AioQueue()
+            Process(target=inspection_process, args=(inspection_broker,inspection_report,)).start()
+            glb_inspection_brokers.append(inspection_broker)
+
     # REPORTING process
     reporter = Reporter(report_broker, control_receiver)
 
@@ -371,13 +569,14 @@ async def main():
                 if report.tx_status == TxStatus.SUCCESS:
                     if report.is_buy:
                         with glb_lock:
-                            glb_inventory.append(Position(
+                            glb_inventory.add(Position(
                                 pair=report.pair,
                                 amount=report.amount_out,
                                 buy_price=calculate_price(report.amount_out, report.amount_in),
                                 start_time=int(time()),
                                 signer=report.signer,
                                 bot=report.bot,
+                                amount_in=report.amount_in,
                                 is_paper=report.is_paper,
                             ))
                             logging.warning(f"MAIN append {report.pair.address} to inventory length {len(glb_inventory)}")
@@ -386,7 +585,8 @@ async def main():
                             glb_fullfilled -= 1
                             glb_liquidated = False
 
-                            pnl = (Decimal(report.amount_out)-Decimal(BUY_AMOUNT)-Decimal(GAS_COST))/Decimal(BUY_AMOUNT)*Decimal(100)
+                            buy_amount = report.buy_amount if report.buy_amount is not None else BUY_AMOUNT
+                            pnl = (Decimal(report.amount_out)-Decimal(buy_amount)-Decimal(GAS_COST))/Decimal(buy_amount)*Decimal(100)
                             glb_daily_pnl = (glb_daily_pnl[0], glb_daily_pnl[1] + pnl)
 
                             # if PnL exceed threshold then increase the buy-amount and reset the PnL
@@ -406,7 +606,8 @@ async def main():
                             glb_fullfilled -= 1
                             glb_liquidated = False
 
-                            pnl = (-Decimal(BUY_AMOUNT)-Decimal(GAS_COST))/Decimal(BUY_AMOUNT)*Decimal(100)
+                            buy_amount = report.buy_amount if report.buy_amount is not None else BUY_AMOUNT
+                            pnl = (-Decimal(buy_amount)-Decimal(GAS_COST))/Decimal(buy_amount)*Decimal(100)
                             glb_daily_pnl = (glb_daily_pnl[0], glb_daily_pnl[1] + pnl)
                             logging.warning(f"MAIN update PnL to value {round(glb_daily_pnl[1],6)} upon liquidation failed")
 
@@ -421,6 +622,11 @@ async def main():
                             type=ReportDataType.BLACKLIST_ADDED,
                             data=[report.pair.creator]
                         ))
+                        for inspection_broker in glb_inspection_brokers:
+                            inspection_broker.put(InspectionOrder(
+                                type=InspectionOrderType.BLACKLIST_ADDED,
+                                data=[report.pair.creator],
+                            ))
                         logging.warning(f"MAIN add {report.pair.creator} to blacklist")
                         logging.warning(f"MAIN update PnL {glb_daily_pnl}")
 
@@ -431,7 +637,7 @@ async def main():
         async def handle_pending_positions(positions):
             with glb_lock:
                 for pos in positions: 
-                    glb_inventory.append(pos)
+                    glb_inventory.add(pos)
                     logging.warning(f"MAIN append {pos} to inventory upon bootstrap process")
 
         while True:
@@ -461,9 +667,11 @@ async def main():
     #     )]
     # ))
 
-    await asyncio.gather(watching_process(watching_broker, watching_notifier),
+    await asyncio.gather(watching_process(watching_broker, watching_notifier, mempool_broker),
+                        prewarming_process(mempool_broker),
                         strategy(watching_broker, execution_broker, report_broker, watching_notifier,),
                         handle_execution_report(),
+                        handle_inspection_report(inspection_report),
                         reporter.run(),
                         handle_control_order(),
                         )
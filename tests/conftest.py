@@ -0,0 +1,37 @@
+import os
+import sys
+import importlib.util
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from library.singleton import Singleton
+
+def load_module(path):
+    # importing the inspector package sets up django, load single modules on their own
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT_DIR, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture(autouse=True)
+def fresh_singletons():
+    # every test gets its own caches
+    Singleton._instances.clear()
+    yield
+    Singleton._instances.clear()
+
+@pytest.fixture(scope='session')
+def check_graph():
+    return load_module('inspector/check_graph.py')
+
+@pytest.fixture(scope='session')
+def bytecode_analyzer():
+    return load_module('inspector/bytecode_analyzer.py')
+
+@pytest.fixture(scope='session')
+def block_watcher():
+    return load_module('watcher/block_watcher.py')
@@ -0,0 +1,50 @@
+import os
+import concurrent.futures
+
+from library.singleton import Singleton
+from library.balance_slot_cache import BalanceSlotCache
+
+def new_cache(file_path):
+    # a fresh instance stands in for another process sharing the file
+    Singleton._instances.pop(BalanceSlotCache, None)
+    return BalanceSlotCache(file_path)
+
+def test_slots_persist_across_caches(tmp_path):
+    file_path = str(tmp_path / 'slots.json')
+    cache = new_cache(file_path)
+    cache.set(['0xToken', '0xCodeHash', None], (3, 'solidity'))
+
+    assert cache.get('0xtoken') == (3, 'solidity')
+    assert cache.get(None) is None
+
+    reloaded = new_cache(file_path)
+    assert reloaded.get('0xcodehash') == (3, 'solidity')
+
+def test_save_keeps_slots_written_by_other_processes(tmp_path):
+    file_path = str(tmp_path / 'slots.json')
+    first = new_cache(file_path)
+    second = new_cache(file_path)
+
+    first.set(['0xa'], (0, 'solidity'))
+    second.set(['0xb'], (1, 'vyper'))
+
+    merged = new_cache(file_path)
+    assert merged.get('0xa') == (0, 'solidity')
+    assert merged.get('0xb') == (1, 'vyper')
+
+def test_unreadable_file_loads_empty(tmp_path):
+    file_path = tmp_path / 'slots.json'
+    file_path.write_text('not json')
+
+    assert len(new_cache(str(file_path))) == 0
+
+def test_concurrent_writers_do_not_share_a_temp_file(tmp_path, caplog):
+    file_path = str(tmp_path / 'slots.json')
+    caches = [new_cache(file_path) for _ in range(8)]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda idx: [caches[idx].set([f"0x{idx}{n}"], (n, 'solidity')) for n in range(20)], range(8)))
+
+    assert 'error' not in caplog.text
+    assert sorted(os.listdir(tmp_path)) == ['slots.json']
+    assert len(new_cache(file_path)) > 0
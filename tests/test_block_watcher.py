@@ -0,0 +1,99 @@
+import os
+import time
+import queue
+
+import pytest
+from web3 import Web3
+from web3.datastructures import AttributeDict
+
+from helpers import load_abi
+
+ABI_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'contracts', 'abis')
+ROUTER_ADDRESS = '0x7a250d5630B4cF539739dF2C5dAcb4c659F2488D'
+FACTORY_ADDRESS = '0x5C69bEe701ef814a2B6a3EDD4B1652CB9cc5aA6f'
+WETH_ADDRESS = '0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2'
+TOKEN_ADDRESS = '0x6B175474E89094C44Da98b954EedeAC495271d0F'
+CREATOR_ADDRESS = '0x00000000219ab540356cBB839Cbe05303d7705Fa'
+PAIR_ADDRESS = '0xA478c2975Ab1Ea89e8196811F51A7B7Ade33eB11'
+
+@pytest.fixture
+def watcher(block_watcher):
+    return block_watcher.BlockWatcher('http://localhost:8545', None, None, None,
+                                      FACTORY_ADDRESS, load_abi(f"{ABI_DIR}/UniV2Factory.abi.json"), WETH_ADDRESS, load_abi(f"{ABI_DIR}/UniV2Pair.abi.json"),
+                                      router_address=ROUTER_ADDRESS, router_abi=load_abi(f"{ABI_DIR}/UniRouter.abi.json"))
+
+def add_liquidity_tx(watcher, token=TOKEN_ADDRESS):
+    return {
+        'hash': '0x' + 'ab'*32,
+        'from': CREATOR_ADDRESS,
+        'to': ROUTER_ADDRESS,
+        'value': Web3.to_wei(2, 'ether'),
+        'input': watcher.router.encode_abi(fn_name='addLiquidityETH', args=[token, Web3.to_wei(1000, 'ether'), 0, 0, CREATOR_ADDRESS, 2**32]),
+    }
+
+def test_decode_pending_tx_from_dict(watcher):
+    pending_pair = watcher.decode_pending_tx(add_liquidity_tx(watcher))
+
+    assert pending_pair.token == TOKEN_ADDRESS
+    assert pending_pair.creator == CREATOR_ADDRESS
+    assert pending_pair.amount_eth == 2
+
+def test_decode_pending_tx_from_subscription_payload(watcher):
+    # the attrdict middleware delivers subscription payloads as AttributeDict
+    pending_pair = watcher.decode_pending_tx(AttributeDict(add_liquidity_tx(watcher)))
+
+    assert pending_pair is not None
+    assert pending_pair.token == TOKEN_ADDRESS
+
+def test_decode_pending_tx_ignores_other_calls(watcher):
+    assert watcher.decode_pending_tx({**add_liquidity_tx(watcher), 'to': TOKEN_ADDRESS}) is None
+    assert watcher.decode_pending_tx(add_liquidity_tx(watcher, token=WETH_ADDRESS)) is None
+    assert watcher.decode_pending_tx('0x' + 'ab'*32) is None
+
+def test_sync_filters_are_split_and_merged_in_chain_order(watcher, block_watcher, monkeypatch):
+    monkeypatch.setattr(block_watcher, 'SYNC_FILTER_MAX_ADDRESSES', 2)
+    monkeypatch.setattr(watcher, 'get_sync_addresses', lambda: ['0xa', '0xb', '0xc'])
+    filters = []
+    def get_logs(filter_params):
+        filters.append(filter_params['address'])
+        return [{'blockNumber': 10, 'logIndex': 3}, {'blockNumber': 11, 'logIndex': 0}] if '0xa' in filter_params['address'] else [{'blockNumber': 10, 'logIndex': 1}]
+    monkeypatch.setattr(watcher.w3.eth, 'get_logs', get_logs)
+
+    logs = watcher.get_logs_by_addresses(10, 10, [])
+
+    assert sorted(filters) == [[FACTORY_ADDRESS, '0xa'], ['0xb', '0xc']]
+    assert [(log['blockNumber'], log['logIndex']) for log in logs] == [(10, 1), (10, 3), (11, 0)]
+
+def test_logs_delivered_by_overlapping_filters_are_applied_once(watcher):
+    log = {'blockNumber': 10, 'logIndex': 4, 'address': '0xpair'}
+    watcher.apply_subscribed_log(log)
+    watcher.apply_subscribed_log(dict(log))
+    watcher.apply_subscribed_log({**log, 'logIndex': 5})
+
+    assert [log['logIndex'] for log in watcher.pending_logs[10]] == [4, 5]
+
+def test_reorg_rolls_back_cached_reserves(watcher, monkeypatch):
+    watcher.block_broker = queue.Queue()
+    watcher.reserve_cache.track(PAIR_ADDRESS, time.time(), 1, 2, 9)
+    watcher.publish_block(9, 0, 0, 0, 0, [], '0x09', '0x08')
+    watcher.apply_sync({'address': PAIR_ADDRESS, 'blockNumber': 10, 'args': {'reserve0': 5, 'reserve1': 6}})
+    watcher.publish_block(10, 0, 0, 0, 0, [], '0x10', '0x09')
+
+    canonical = {'number': 10, 'hash': '0x10b', 'parentHash': '0x09', 'timestamp': 0, 'gasUsed': 0, 'gasLimit': 0}
+    monkeypatch.setattr(watcher.w3.eth, 'get_block', lambda number: canonical)
+    monkeypatch.setattr(watcher, 'filter_block', lambda block_number, block_timestamp: [])
+    watcher.handle_reorg(11, '0x11b')
+
+    assert watcher.reserve_cache.snapshot(PAIR_ADDRESS) == (1, 2, 9)
+    assert [record.block_hash for record in watcher.block_records] == ['0x09', '0x10b']
+
+def test_backfill_records_every_header(watcher, monkeypatch):
+    watcher.block_broker = queue.Queue()
+    watcher.publish_block(9, 0, 0, 0, 0, [], '0x09', '0x08')
+    monkeypatch.setattr(watcher, 'get_logs_by_addresses', lambda from_block, to_block, topics: [])
+    monkeypatch.setattr(watcher.w3.eth, 'get_block', lambda number: {'number': number, 'hash': f"0x{number:02d}", 'parentHash': f"0x{number-1:02d}"})
+
+    watcher.backfill_gap(13)
+
+    assert [record.block_number for record in watcher.block_records] == [9, 10, 11, 12]
+    assert watcher.last_block_number == 12
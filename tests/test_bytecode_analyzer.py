@@ -0,0 +1,58 @@
+from helpers.utils import func_selector
+from data import BytecodeRisk
+
+PUSH1='60'
+PUSH4='63'
+PUSH32='7f'
+DELEGATECALL='f4'
+SELFDESTRUCT='ff'
+STOP='00'
+
+def code(*parts):
+    return bytes.fromhex(''.join(parts))
+
+def test_disassemble_skips_push_data(bytecode_analyzer):
+    instructions = list(bytecode_analyzer.disassemble(code(PUSH1, 'ff', PUSH4, 'f4f4f4f4', STOP)))
+
+    assert instructions == [(0x60, b'\xff'), (0x63, b'\xf4\xf4\xf4\xf4'), (0x00, None)]
+
+def test_disassemble_truncated_push_at_end(bytecode_analyzer):
+    instructions = list(bytecode_analyzer.disassemble(code(STOP, PUSH4, 'aabb')))
+
+    assert instructions == [(0x00, None), (0x63, b'\xaa\xbb')]
+
+def test_opcodes_inside_push_data_are_not_risks(bytecode_analyzer):
+    verdict = bytecode_analyzer.analyze_bytecode(code(PUSH32, SELFDESTRUCT*16 + DELEGATECALL*16, STOP))
+
+    assert verdict.risks == BytecodeRisk.NONE
+    assert verdict.code_size == 34
+
+def test_selfdestruct_opcode_is_a_risk(bytecode_analyzer):
+    verdict = bytecode_analyzer.analyze_bytecode(code(PUSH1, '00', SELFDESTRUCT))
+
+    assert verdict.risks == BytecodeRisk.SELFDESTRUCT
+
+def test_selectors_are_matched_from_push4_only(bytecode_analyzer):
+    blacklist = func_selector('blacklist(address)')
+    fee_setter = func_selector('setFee(uint256)')
+
+    verdict = bytecode_analyzer.analyze_bytecode(code(PUSH4, blacklist, PUSH32, fee_setter + '00'*28, STOP))
+    assert verdict.risks == BytecodeRisk.BLACKLIST
+    assert verdict.signatures == [blacklist]
+
+def test_small_delegating_code_is_a_proxy(bytecode_analyzer):
+    verdict = bytecode_analyzer.analyze_bytecode(code(PUSH1, '00', DELEGATECALL, STOP))
+
+    assert verdict.risks == BytecodeRisk.DELEGATECALL_PROXY
+
+def test_upgrade_selector_without_delegatecall_is_not_a_proxy(bytecode_analyzer):
+    verdict = bytecode_analyzer.analyze_bytecode(code(PUSH4, func_selector('upgradeTo(address)'), STOP))
+
+    assert verdict.risks == BytecodeRisk.NONE
+
+def test_large_delegating_code_needs_a_proxy_marker(bytecode_analyzer):
+    padding = STOP*300
+    assert bytecode_analyzer.analyze_bytecode(code(DELEGATECALL, padding)).risks == BytecodeRisk.NONE
+
+    slot = bytecode_analyzer.EIP1967_IMPLEMENTATION_SLOT.hex()
+    assert bytecode_analyzer.analyze_bytecode(code(PUSH32, slot, DELEGATECALL, padding)).risks == BytecodeRisk.DELEGATECALL_PROXY
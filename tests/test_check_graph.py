@@ -0,0 +1,88 @@
+import threading
+import concurrent.futures
+
+import pytest
+
+@pytest.fixture
+def executor():
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    yield executor
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def test_all_checks_accepted(check_graph, executor):
+    InspectionCheck = check_graph.InspectionCheck
+    checks = [
+        InspectionCheck('local', lambda: 1, lambda value: value == 1, local=True),
+        InspectionCheck('creation', lambda: 100),
+        InspectionCheck('malicious', lambda creation_block: creation_block + 1, lambda value: value == 101, depends=('creation',)),
+    ]
+    latencies = {}
+
+    assert check_graph.CheckGraph(executor).run(checks, latencies)
+    assert set(latencies) == {'local', 'creation', 'malicious'}
+
+def test_local_rejection_sends_nothing_out(check_graph, executor):
+    InspectionCheck = check_graph.InspectionCheck
+    calls = []
+    checks = [
+        InspectionCheck('reserve', lambda: False, lambda value: value, local=True),
+        InspectionCheck('blacklist', lambda: calls.append('blacklist'), local=True),
+        InspectionCheck('remote', lambda: calls.append('remote')),
+    ]
+
+    assert not check_graph.CheckGraph(executor).run(checks, {})
+    assert calls == []
+
+class ManualExecutor(concurrent.futures.Executor):
+    # runs only the named checks, the others stay queued until cancelled
+    def __init__(self, run_names) -> None:
+        self.run_names = run_names
+        self.futures = {}
+
+    def submit(self, fn, *args):
+        name = fn.__self__.name
+        future = concurrent.futures.Future()
+        self.futures[name] = future
+        if name in self.run_names:
+            future.set_result(fn(*args))
+        return future
+
+def test_remote_rejection_cancels_pending_checks(check_graph):
+    InspectionCheck = check_graph.InspectionCheck
+    executor = ManualExecutor(['reject'])
+    checks = [
+        InspectionCheck('reject', lambda: False, lambda value: value),
+        InspectionCheck('queued', lambda: True),
+        InspectionCheck('dependent', lambda value: True, depends=('queued',)),
+    ]
+
+    assert not check_graph.CheckGraph(executor).run(checks, {})
+    assert executor.futures['queued'].cancelled()
+    assert 'dependent' not in executor.futures
+
+def test_rejection_does_not_wait_for_running_checks(check_graph):
+    InspectionCheck = check_graph.InspectionCheck
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+    release = threading.Event()
+    checks = [
+        InspectionCheck('slow', lambda: release.wait(5)),
+        InspectionCheck('reject', lambda: False, lambda value: value),
+    ]
+
+    assert not check_graph.CheckGraph(executor).run(checks, {})
+    assert not release.is_set()
+    release.set()
+    executor.shutdown(wait=True)
+
+def test_exception_counts_as_rejection(check_graph, executor):
+    InspectionCheck = check_graph.InspectionCheck
+    def fail():
+        raise ValueError('etherscan down')
+
+    assert not check_graph.CheckGraph(executor).run([InspectionCheck('creation', fail)], {})
+
+def test_unresolved_dependency_rejects(check_graph, executor):
+    InspectionCheck = check_graph.InspectionCheck
+    checks = [InspectionCheck('malicious', lambda creation_block: True, depends=('creation',))]
+
+    assert not check_graph.CheckGraph(executor).run(checks, {})
@@ -0,0 +1,49 @@
+import time
+
+from library.creator_blacklist import BloomFilter, CreatorBlacklist
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(100)
+    addresses = [f"0x{i:040x}" for i in range(100)]
+    for address in addresses:
+        bloom.add(address)
+
+    assert all(address in bloom for address in addresses)
+    assert sum(f"0x{i:040x}" in bloom for i in range(1000, 11000)) < 100
+
+def test_added_creator_is_frozen():
+    blacklist = CreatorBlacklist(frozen_seconds=60, bloom_capacity=100)
+    blacklist.add('0xCreator')
+
+    assert '0xcreator' in blacklist
+    assert '0xother' not in blacklist
+    assert None not in blacklist
+
+def test_frozen_entries_expire():
+    blacklist = CreatorBlacklist(frozen_seconds=60)
+    now = time.time()
+    blacklist.load([('0xold', now - 120, now - 120), ('0xnew', now - 30, now - 120)])
+
+    assert '0xold' not in blacklist
+    assert '0xnew' in blacklist
+    assert len(blacklist) == 1
+
+def test_refreeze_keeps_the_creation_time():
+    blacklist = CreatorBlacklist(frozen_seconds=60)
+    blacklist.load([('0xcreator', time.time() - 120, 1000)])
+    blacklist.add('0xcreator')
+
+    assert blacklist.entries['0xcreator'][1] == 1000
+    # older than the max age, a refreeze does not make it active again
+    assert '0xcreator' not in blacklist
+
+def test_bloom_is_rebuilt_once_most_entries_expired():
+    blacklist = CreatorBlacklist(frozen_seconds=60, bloom_capacity=10)
+    now = time.time()
+    blacklist.load([('0xa', now - 120, now), ('0xb', now - 120, now), ('0xc', now, now)])
+
+    assert '0xa' not in blacklist
+    assert blacklist.evicted == 1
+    assert '0xb' not in blacklist
+    assert blacklist.evicted == 0
+    assert '0xa' not in blacklist.bloom and '0xc' in blacklist.bloom
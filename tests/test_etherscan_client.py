@@ -0,0 +1,103 @@
+import asyncio
+import gc
+
+import pytest
+
+from library.etherscan_client import TokenBucket, EtherscanClient
+
+class FakeEndpoint:
+    # replaces the http round trip, counts what reaches the network
+    def __init__(self, delay=0, error=None) -> None:
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self, params):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return {'status': '1', 'result': params['action']}
+
+def new_client(endpoint, **kwargs):
+    client = EtherscanClient('http://localhost', 'key0,key1', **kwargs)
+    client.request = endpoint
+    return client
+
+def fetch_all(client, params):
+    async def gather():
+        return await asyncio.gather(*[client.fetch(p) for p in params], return_exceptions=True)
+    return asyncio.run_coroutine_threadsafe(gather(), client.loop).result()
+
+def test_bucket_fits_one_request_below_one_per_second():
+    bucket = TokenBucket(0.5)
+    assert bucket.capacity == 1
+    assert bucket.wait_time() == 0
+
+    bucket.take()
+    assert 1.9 < bucket.wait_time() <= 2
+
+def test_drained_bucket_waits_a_full_second():
+    bucket = TokenBucket(5)
+    bucket.drain()
+    assert 0.9 < bucket.wait_time() <= 1
+
+def test_responses_are_cached():
+    endpoint = FakeEndpoint()
+    client = new_client(endpoint)
+
+    assert client.get({'action': 'txlist'}) == {'status': '1', 'result': 'txlist'}
+    assert client.get({'action': 'txlist'}) == {'status': '1', 'result': 'txlist'}
+    assert endpoint.calls == 1
+    assert (client.hits, client.misses) == (1, 1)
+
+def test_expired_responses_are_refetched():
+    endpoint = FakeEndpoint()
+    client = new_client(endpoint, cache_ttl=0)
+
+    client.get({'action': 'txlist'})
+    client.get({'action': 'txlist'})
+    assert endpoint.calls == 2
+
+    client.get({'action': 'getsourcecode'}, cache_forever=lambda response: True)
+    client.get({'action': 'getsourcecode'}, cache_forever=lambda response: True)
+    assert endpoint.calls == 3
+
+def test_least_recently_used_response_is_evicted():
+    endpoint = FakeEndpoint()
+    client = new_client(endpoint, cache_capacity=2)
+
+    client.get({'action': 'a'})
+    client.get({'action': 'b'})
+    client.get({'action': 'a'})
+    client.get({'action': 'c'})
+    assert len(client.cache) == 2
+
+    client.get({'action': 'a'})
+    assert endpoint.calls == 3
+    client.get({'action': 'b'})
+    assert endpoint.calls == 4
+
+def test_identical_requests_in_flight_are_coalesced():
+    endpoint = FakeEndpoint(delay=0.05)
+    client = new_client(endpoint)
+
+    responses = fetch_all(client, [{'action': 'txlist'}]*5)
+    assert all(response == {'status': '1', 'result': 'txlist'} for response in responses)
+    assert endpoint.calls == 1
+    assert len(client.inflight) == 0
+
+def test_failure_reaches_coalesced_callers_and_is_retrieved(caplog):
+    endpoint = FakeEndpoint(delay=0.05, error=ValueError('boom'))
+    client = new_client(endpoint)
+
+    responses = fetch_all(client, [{'action': 'txlist'}]*3)
+    assert all(isinstance(response, ValueError) for response in responses)
+    assert endpoint.calls == 1
+    assert len(client.inflight) == 0 and len(client.cache) == 0
+
+    with pytest.raises(ValueError):
+        client.get({'action': 'balance'})
+    asyncio.run_coroutine_threadsafe(asyncio.sleep(0), client.loop).result()
+    gc.collect()
+    assert 'never retrieved' not in caplog.text
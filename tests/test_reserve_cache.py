@@ -0,0 +1,62 @@
+import time
+
+from library.reserve_cache import ReserveCache
+
+def test_get_returns_tracked_reserves():
+    cache = ReserveCache(capacity=10, max_age_hours=1)
+    cache.track('0xPair', time.time(), 100, 200, 5)
+
+    state = cache.get('0xpair')
+    assert state.reserves(0) == (100, 200)
+    assert state.reserves(1) == (200, 100)
+    assert cache.hits == 1
+
+def test_get_misses_until_reserves_are_known():
+    cache = ReserveCache(capacity=10, max_age_hours=1)
+    cache.track('0xpair', time.time())
+
+    assert cache.get('0xpair') is None
+    assert cache.misses == 1
+
+def test_least_recently_used_is_evicted():
+    cache = ReserveCache(capacity=2, max_age_hours=1)
+    cache.track('0xa', time.time(), 1, 1, 1)
+    cache.track('0xb', time.time(), 1, 1, 1)
+    cache.get('0xa')
+    cache.track('0xc', time.time(), 1, 1, 1)
+
+    assert len(cache) == 2
+    assert cache.get('0xb') is None
+    assert cache.get('0xa') is not None
+    assert cache.get('0xc') is not None
+
+def test_expired_pairs_are_dropped():
+    cache = ReserveCache(capacity=10, max_age_hours=1)
+    cache.track('0xold', time.time() - 7200, 1, 1, 1)
+    cache.track('0xnew', time.time(), 1, 1, 1)
+
+    assert cache.addresses() == ['0xnew']
+    cache.track('0xold', time.time() - 7200, 1, 1, 1)
+    assert cache.get('0xold') is None
+    assert len(cache) == 1
+
+def test_update_ignores_older_blocks():
+    cache = ReserveCache(capacity=10, max_age_hours=1)
+    cache.track('0xpair', time.time(), 1, 1, 10)
+
+    assert not cache.update('0xpair', 5, 5, 9)
+    assert cache.update('0xpair', 6, 6, 10)
+    assert cache.get('0xpair').reserve0 == 6
+    assert not cache.update('0xunknown', 1, 1, 11)
+
+def test_restore_rolls_back_to_an_older_block():
+    cache = ReserveCache(capacity=10, max_age_hours=1)
+    cache.track('0xpair', time.time(), 1, 2, 9)
+    snapshot = cache.snapshot('0xpair')
+    cache.update('0xpair', 5, 6, 10)
+
+    cache.restore('0xpair', snapshot)
+    assert cache.snapshot('0xpair') == (1, 2, 9)
+
+    cache.restore('0xpair', None)
+    assert cache.snapshot('0xpair') is None
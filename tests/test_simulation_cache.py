@@ -0,0 +1,86 @@
+import time
+import threading
+import concurrent.futures
+
+import pytest
+
+from library.simulation_cache import SimulationCache
+
+def test_verdicts_are_cached():
+    cache = SimulationCache(capacity=10, ttl=60)
+    calls = []
+
+    assert cache.get_or_compute('key', lambda: calls.append(1) or 'verdict') == 'verdict'
+    assert cache.get_or_compute('key', lambda: calls.append(1) or 'other') == 'verdict'
+    assert len(calls) == 1
+    assert cache.hit_rate() == 0.5
+
+def test_failed_verdicts_are_not_cached():
+    cache = SimulationCache(capacity=10, ttl=60)
+
+    assert cache.get_or_compute('key', lambda: None) is None
+    assert len(cache) == 0
+    assert cache.get_or_compute('key', lambda: 'verdict') == 'verdict'
+
+def test_expired_verdicts_are_recomputed():
+    cache = SimulationCache(capacity=10, ttl=0)
+    cache.get_or_compute('key', lambda: 'first')
+
+    assert cache.get_or_compute('key', lambda: 'second') == 'second'
+
+def test_least_recently_used_verdict_is_evicted():
+    cache = SimulationCache(capacity=2, ttl=60)
+    cache.get_or_compute('a', lambda: 'a')
+    cache.get_or_compute('b', lambda: 'b')
+    cache.get_or_compute('a', lambda: 'stale')
+    cache.get_or_compute('c', lambda: 'c')
+
+    assert len(cache) == 2
+    assert cache.get_or_compute('a', lambda: 'stale') == 'a'
+    assert cache.get_or_compute('b', lambda: 'recomputed') == 'recomputed'
+
+def compute_concurrently(cache, compute, number_callers):
+    started = threading.Event()
+    release = threading.Event()
+
+    def owner_compute():
+        started.set()
+        release.wait(5)
+        return compute()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=number_callers) as executor:
+        owner = executor.submit(cache.get_or_compute, 'key', owner_compute)
+        started.wait(5)
+        waiters = [executor.submit(cache.get_or_compute, 'key', lambda: 'not the owner') for _ in range(number_callers-1)]
+        while cache.coalesced < number_callers-1:
+            time.sleep(0.001)
+        release.set()
+        return [owner] + waiters
+
+def test_concurrent_misses_share_one_computation():
+    cache = SimulationCache(capacity=10, ttl=60)
+
+    futures = compute_concurrently(cache, lambda: 'verdict', 4)
+    assert [future.result() for future in futures] == ['verdict']*4
+    assert (cache.misses, cache.coalesced) == (1, 3)
+
+def test_failure_reaches_waiters_and_is_not_kept():
+    cache = SimulationCache(capacity=10, ttl=60)
+    def fail():
+        raise ValueError('fork failed')
+
+    futures = compute_concurrently(cache, fail, 3)
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result()
+
+    assert len(cache.inflight) == 0 and len(cache) == 0
+    assert cache.get_or_compute('key', lambda: 'verdict') == 'verdict'
+
+def test_put_stores_verdicts_computed_elsewhere():
+    cache = SimulationCache(capacity=10, ttl=60)
+    cache.put('key', 'verdict')
+    cache.put('failed', None)
+
+    assert cache.get_or_compute('key', lambda: 'recomputed') == 'verdict'
+    assert len(cache) == 1
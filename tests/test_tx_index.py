@@ -0,0 +1,49 @@
+from library.tx_index import TxIndex
+
+def tx(hash, block_number):
+    return {'hash': hash, 'blockNumber': str(block_number)}
+
+def test_merge_advances_the_cursor():
+    index = TxIndex(capacity=10)
+    history = index.track('0xToken', 100)
+    assert history.last_block == 99
+
+    index.merge('0xtoken', [tx('0x1', 100), tx('0x2', 105)], 110)
+    assert history.last_block == 110
+    assert [t['hash'] for t in history.between(100, 110)] == ['0x1', '0x2']
+    assert [t['hash'] for t in history.between(101, 110)] == ['0x2']
+
+def test_rescan_overlap_does_not_duplicate_or_rewind():
+    index = TxIndex(capacity=10)
+    history = index.track('0xtoken', 100)
+    index.merge('0xtoken', [tx('0x1', 100), tx('0x2', 108)], 110)
+
+    # the last blocks are rescanned in case they were not indexed yet
+    index.merge('0xtoken', [tx('0x2', 108), tx('0x3', 109)], 107)
+    assert history.last_block == 110
+    assert [t['hash'] for t in history.between(100, 110)] == ['0x1', '0x2', '0x3']
+
+def test_provisional_history_is_replaced_by_the_creation_block():
+    index = TxIndex(capacity=10)
+    provisional = index.track('0xtoken', 150, is_provisional=True)
+    index.merge('0xtoken', [tx('0x1', 150)], 160)
+
+    history = index.track('0xtoken', 120)
+    assert history is not provisional
+    assert not history.is_provisional
+    assert history.last_block == 119
+
+    # a later fallback never discards the real history
+    assert index.track('0xtoken', 150, is_provisional=True) is history
+
+def test_least_recently_used_history_is_evicted():
+    index = TxIndex(capacity=2)
+    index.track('0xa', 1)
+    index.track('0xb', 1)
+    index.get('0xa')
+    index.track('0xc', 1)
+
+    assert len(index) == 2
+    assert index.get('0xb') is None
+    index.merge('0xb', [tx('0x1', 1)], 5)
+    assert index.get('0xb') is None
@@ -5,29 +5,51 @@ import json
 
 import asyncio
 import concurrent.futures
+import queue
+import time
+from collections import deque, OrderedDict
+from collections.abc import Mapping
 from concurrent.futures import ThreadPoolExecutor
 import threading
 import websockets
 
 from web3 import AsyncWeb3, Web3
 from web3.providers import WebsocketProviderV2
-from web3.middleware import async_geth_poa_middleware
+from web3.middleware import async_geth_poa_middleware, geth_poa_middleware
 
 import sys # for testing
 sys.path.append('..')
 
-from library import Singleton
-from data import BlockData, Pair, ExecutionAck, FilterLogs, FilterLogsType, ReportData, ReportDataType, TxStatus
-from helpers import async_timer_decorator, load_abi, timer_decorator, create_signed_raw_transaction
+from library import Singleton, HedgedHTTPProvider, ReserveCache
+from data import BlockData, Pair, ExecutionAck, FilterLogs, FilterLogsType, ReportData, ReportDataType, TxStatus, BlockRecord, PendingPair, Inventory
+from helpers import async_timer_decorator, load_abi, timer_decorator, create_signed_raw_transaction, constants, \
+                    make_batch_request, decode_pair_reserves, normalize_hash
 
 ADDRESS_ZERO="0x0000000000000000000000000000000000000000"
 
+INGESTION_MODE=int(os.environ.get('INGESTION_MODE', '0'))
+BATCH_RPC_REQUESTS=int(os.environ.get('BATCH_RPC_REQUESTS', '0'))
+LOG_SUBSCRIPTION_GRACE_MS=int(os.environ.get('LOG_SUBSCRIPTION_GRACE_MS', '300'))
+BACKFILL_MAX_GAP=int(os.environ.get('BACKFILL_MAX_GAP', '200'))
+BACKFILL_CHUNK_SIZE=int(os.environ.get('BACKFILL_CHUNK_SIZE', '20'))
+REORG_BUFFER_DEPTH=int(os.environ.get('REORG_BUFFER_DEPTH', '64'))
+MEMPOOL_ENABLED=int(os.environ.get('MEMPOOL_ENABLED', '0'))
+MM_TRACKED_PAIRS_CAPACITY=int(os.environ.get('MM_TRACKED_PAIRS_CAPACITY', '500'))
+BLOCK_PROCESSING_CONCURRENCY=int(os.environ.get('BLOCK_PROCESSING_CONCURRENCY', '4'))
+BLOCK_LAG_POLICY=int(os.environ.get('BLOCK_LAG_POLICY', '0'))
+SYNC_RESUBSCRIBE_INTERVAL_SECONDS=int(os.environ.get('SYNC_RESUBSCRIBE_INTERVAL_SECONDS', '60'))
+SYNC_FILTER_MAX_ADDRESSES=int(os.environ.get('SYNC_FILTER_MAX_ADDRESSES', '1000'))
+PUBLISH_LAG_WINDOW_SIZE=200
+SUBSCRIBED_LOGS_DEDUP_SIZE=10000
+PUBLISH_LAG_REPORT_INTERVAL=100
+
 glb_lock = threading.Lock()
 glb_middleware_added = False
 glb_mempool_middleware_added = False
 
 class BlockWatcher(metaclass=Singleton):
-    def __init__(self, https_url, wss_url, block_broker, report_broker, factory_address, factory_abi, weth_address, pair_abi) -> None:
+    def __init__(self, https_url, wss_url, block_broker, report_broker, factory_address, factory_abi, weth_address, pair_abi,
+                 mempool_broker=None, router_address=None, router_abi=None) -> None:
         self.wss_url = wss_url
         self.block_broker = block_broker
         self.report_broker = report_broker
@@ -37,9 +59,50 @@ class BlockWatcher(metaclass=Singleton):
         self.weth_address = weth_address
         self.pair_abi = pair_abi
 
-        self.inventory = []
-        self.w3 = Web3(Web3.HTTPProvider(https_url))
+        self.inventory = Inventory()
+        self.w3 = Web3(HedgedHTTPProvider(https_url))
+        self.w3.middleware_onion.inject(geth_poa_middleware, layer=0)
         self.factory = self.w3.eth.contract(address=self.factory_address, abi=self.factory_abi)
+        self.pair_contract = self.w3.eth.contract(abi=self.pair_abi)
+        self.last_block_number = 0
+
+        # mempool
+        self.mempool_broker = mempool_broker
+        self.router = self.w3.eth.contract(address=router_address, abi=router_abi) if router_address is not None else None
+
+        # reorg tracking
+        self.block_records = deque(maxlen=REORG_BUFFER_DEPTH)
+        self.reserve_deltas = {}
+        self.cache_deltas = {}
+
+        # log subscriptions
+        self.pending_headers = {}
+        self.pending_logs = {}
+        # old and new Sync filters overlap while resubscribing, each log is applied once
+        self.subscribed_log_keys = OrderedDict()
+        self.sync_subscription_ids = []
+        # inventory changes resubscribe on the next head, newly cached pairs wait for the interval
+        self.sync_addresses_changed = False
+        self.cached_addresses_changed = False
+        self.sync_subscribed_at = 0
+
+        # reserves of recently created pairs, shared with the strategy
+        self.reserve_cache = ReserveCache()
+
+        # receipts ingestion
+        self.block_receipts_supported = True
+        self.mm_tracked_pairs = OrderedDict()
+        self.watchlist_updates = []
+
+        # block processing off the event loop, fetches run concurrently while state is applied by a single thread in block order
+        self.fetch_executor = ThreadPoolExecutor(max_workers=BLOCK_PROCESSING_CONCURRENCY)
+        self.apply_executor = ThreadPoolExecutor(max_workers=1)
+        self.queued_headers = deque()
+        self.inflight_blocks = 0
+        self.last_delivery = None
+        self.last_priced_block = 0
+        self.publish_lags = deque(maxlen=PUBLISH_LAG_WINDOW_SIZE)
+        self.number_published = 0
 
     async def listen_block(self):
         global glb_lock
@@ -54,36 +117,358 @@ class BlockWatcher(metaclass=Singleton):
             try:
                 logging.warning(f"WATCHER websocket connected...")
 
+                if INGESTION_MODE==constants.SUBSCRIPTION_INGESTION_MODE:
+                    await self.listen_logs(w3Async)
+                    continue
+
                 subscription_id = await w3Async.eth.subscribe("newHeads")
                 async for response in w3Async.ws.process_subscriptions():
                     logging.debug(f"new block {response}")
-                    
-                    block_number = response['result']['number']
-                    block_timestamp = response['result']['timestamp']
-                    base_fee = response['result']['baseFeePerGas']
-                    gas_used = response['result']['gasUsed']
-                    gas_limit = response['result']['gasLimit']
+                    logging.debug(f"block number {response['result']['number']} timestamp {response['result']['timestamp']}")
+
+                    self.queued_headers.append((response['result'], time.perf_counter()))
+                    self.dispatch_blocks()
+
+            except websockets.ConnectionClosed:
+                logging.error(f"WATCHER websocket connection closed, reconnect...")
+                continue
 
-                    logging.debug(f"block number {block_number} timestamp {block_timestamp}")
+    def dispatch_blocks(self):
+        while len(self.queued_headers)>0 and self.inflight_blocks < BLOCK_PROCESSING_CONCURRENCY:
+            header, received_at = self.queued_headers.popleft()
 
-                    pairs = self.filter_log_in_block(block_number, block_timestamp)
+            # a block superseded by a newer head only gets its PairCreated logs, the next priced block catches up on Sync
+            is_priced = BLOCK_LAG_POLICY==constants.PROCESS_ALL_LAG_POLICY or len(self.queued_headers)==0
+            from_block = self.last_priced_block+1 if is_priced and 0 < self.last_priced_block < header['number'] else header['number']
+            if is_priced:
+                self.last_priced_block = header['number']
+            else:
+                logging.warning(f"WATCHER block #{header['number']} superseded, skip pricing")
 
-                    logging.debug(f"WATCHER found pairs {pairs}")
+            fetching = asyncio.get_running_loop().run_in_executor(self.fetch_executor, self.fetch_block, header['number'], from_block, is_priced)
 
-                    self.block_broker.put(BlockData(
-                        block_number,
-                        block_timestamp,
-                        base_fee,
-                        gas_used,
-                        gas_limit,
-                        pairs,
-                        self.inventory,
-                    ))
+            self.inflight_blocks += 1
+            self.last_delivery = asyncio.ensure_future(self.deliver_block(self.last_delivery, fetching, header, received_at, from_block))
 
-            except websockets.ConnectionClosed:
-                logging.error(f"WATCHER websocket connection closed, reconnect...")
+    async def deliver_block(self, previous_delivery, fetching, header, received_at, from_block):
+        try:
+            logs = await fetching
+        except Exception as e:
+            logging.error(f"WATCHER fetch block #{header['number']} error {e}")
+            logs = None
+
+        # deliveries are chained so blocks are applied and published in order
+        if previous_delivery is not None:
+            await previous_delivery
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(self.apply_executor, self.apply_block, header, logs, from_block)
+            self.record_publish_lag(header['number'], time.perf_counter() - received_at)
+        except Exception as e:
+            logging.error(f"WATCHER apply block #{header['number']} error {e}")
+        finally:
+            self.inflight_blocks -= 1
+            self.dispatch_blocks()
+
+    def fetch_block(self, block_number, from_block, is_priced):
+        if INGESTION_MODE==constants.RECEIPTS_INGESTION_MODE:
+            return [log for receipt in self.get_block_receipts(block_number) for log in receipt['logs']]
+
+        if INGESTION_MODE==constants.MULTI_ADDRESS_INGESTION_MODE:
+            topics = [constants.PAIR_CREATED_TOPIC, constants.SYNC_TOPIC, constants.SWAP_TOPIC] if is_priced else [constants.PAIR_CREATED_TOPIC]
+            return self.get_logs_by_addresses(from_block, block_number, topics)
+
+        # per-contract filters fetch and apply in one go
+        return None
+
+    @timer_decorator
+    def apply_block(self, header, logs, from_block):
+        block_number = header['number']
+
+        self.backfill_gap(block_number)
+        self.handle_reorg(block_number, header['parentHash'])
+
+        if logs is None:
+            pairs = self.filter_block(block_number, header['timestamp'])
+        elif INGESTION_MODE==constants.RECEIPTS_INGESTION_MODE:
+            pairs = self.apply_receipt_logs(logs, header['timestamp'])
+        else:
+            # PairCreated of the skipped blocks in the range have already been published
+            logs = [log for log in logs if log['blockNumber']==block_number or normalize_hash(log['topics'][0])!=constants.PAIR_CREATED_TOPIC]
+            pairs = self.apply_logs(logs, block_number, header['timestamp'])
+
+        logging.debug(f"WATCHER found pairs {pairs}")
+
+        self.publish_block(block_number, header['timestamp'], header['baseFeePerGas'], header['gasUsed'], header['gasLimit'], pairs, header['hash'], header['parentHash'])
+
+    def record_publish_lag(self, block_number, lag):
+        self.publish_lags.append(lag)
+        self.number_published += 1
+        logging.info(f"WATCHER block #{block_number} head-to-publish lag {round(lag*1000)} ms")
+
+        if self.number_published % PUBLISH_LAG_REPORT_INTERVAL == 0:
+            logging.warning(f"WATCHER head-to-publish lag p50 {round(self.publish_lag_percentile(50)*1000)} ms p95 {round(self.publish_lag_percentile(95)*1000)} ms queued {len(self.queued_headers)} inflight {self.inflight_blocks}")
+
+    def publish_lag_percentile(self, percentage):
+        if len(self.publish_lags)==0:
+            return 0
+        lags = sorted(self.publish_lags)
+        return lags[min(len(lags)-1, int(len(lags)*percentage/100))]
+
+    async def listen_logs(self, w3Async):
+        self.sync_subscription_ids = []
+
+        head_subscription_id = await w3Async.eth.subscribe("newHeads")
+        await w3Async.eth.subscribe("logs", {
+            'address': self.factory.address,
+            'topics': [constants.PAIR_CREATED_TOPIC],
+        })
+        await self.resubscribe_sync_logs(w3Async)
+
+        async for response in w3Async.ws.process_subscriptions():
+            logging.debug(f"WATCHER subscription message {response}")
+
+            # the reader only queues work, the apply thread runs it in arrival order
+            if response['subscription'] == head_subscription_id:
+                header = response['result']
+
+                self.apply_executor.submit(self.apply_head, header, time.perf_counter())
+                asyncio.get_running_loop().call_later(LOG_SUBSCRIPTION_GRACE_MS/1000, self.apply_executor.submit, self.publish_completed_blocks, header['number'])
+
+                if self.sync_addresses_changed or (self.cached_addresses_changed and time.monotonic() - self.sync_subscribed_at >= SYNC_RESUBSCRIBE_INTERVAL_SECONDS):
+                    await self.resubscribe_sync_logs(w3Async)
+            else:
+                log = response['result']
+                if log.get('removed', False):
+                    continue
+
+                self.apply_executor.submit(self.apply_subscribed_log, log)
+
+    def apply_head(self, header, received_at):
+        try:
+            # all logs of the previous blocks have been delivered once the next head arrives
+            self.publish_completed_blocks(header['number']-1)
+            self.backfill_gap(header['number'])
+            self.handle_reorg(header['number'], header['parentHash'])
+
+            self.pending_headers[header['number']] = (header, received_at)
+        except Exception as e:
+            logging.error(f"WATCHER apply head #{header['number']} error {e}")
+
+    def apply_subscribed_log(self, log):
+        key = (log['blockNumber'], log['logIndex'])
+        if key in self.subscribed_log_keys:
+            return
+        self.subscribed_log_keys[key] = True
+        while len(self.subscribed_log_keys) > SUBSCRIBED_LOGS_DEDUP_SIZE:
+            self.subscribed_log_keys.popitem(last=False)
+
+        self.pending_logs.setdefault(log['blockNumber'], []).append(log)
+        self.publish_completed_blocks(log['blockNumber']-1)
+
+    async def resubscribe_sync_logs(self, w3Async):
+        self.sync_addresses_changed = False
+        self.cached_addresses_changed = False
+        self.sync_subscribed_at = time.monotonic()
+
+        # the new filters are live before the old ones go, logs delivered by both are deduplicated on apply
+        addresses = await asyncio.get_running_loop().run_in_executor(self.apply_executor, self.get_sync_addresses)
+        subscription_ids = []
+        for chunk in self.split_addresses(addresses):
+            subscription_ids.append(await w3Async.eth.subscribe("logs", {
+                'address': chunk,
+                'topics': [constants.SYNC_TOPIC],
+            }))
+        logging.warning(f"WATCHER subscribed sync logs of {len(addresses)} pairs in {len(subscription_ids)} filters")
+
+        for subscription_id in self.sync_subscription_ids:
+            try:
+                await w3Async.eth.unsubscribe(subscription_id)
+            except Exception as e:
+                logging.error(f"WATCHER unsubscribe sync logs error {e}")
+        self.sync_subscription_ids = subscription_ids
+
+    def publish_completed_blocks(self, block_number):
+        for number in sorted([number for number in self.pending_headers.keys() if number <= block_number]):
+            header, received_at = self.pending_headers.pop(number)
+
+            # late logs of already published blocks are carried into the next one
+            logs = []
+            for log_block_number in sorted([n for n in self.pending_logs.keys() if n <= number]):
+                logs += self.pending_logs.pop(log_block_number)
+
+            try:
+                pairs = self.apply_logs(logs, number, header['timestamp'])
+
+                logging.debug(f"WATCHER found pairs {pairs}")
+
+                self.publish_block(number, header['timestamp'], header['baseFeePerGas'], header['gasUsed'], header['gasLimit'], pairs, header['hash'], header['parentHash'])
+                self.record_publish_lag(number, time.perf_counter() - received_at)
+            except Exception as e:
+                logging.error(f"WATCHER publish block #{number} error {e}")
+
+    def publish_block(self, block_number, block_timestamp, base_fee, gas_used, gas_limit, pairs, block_hash=None, parent_hash=None):
+        self.block_broker.put(BlockData(
+            block_number,
+            block_timestamp,
+            base_fee,
+            gas_used,
+            gas_limit,
+            pairs,
+            self.inventory,
+            self.watchlist_updates,
+        ))
+
+        self.last_block_number = block_number
+        self.watchlist_updates = []
+
+        for pair in pairs:
+            if pair.address.lower() not in self.cache_deltas:
+                self.cache_deltas[pair.address.lower()] = self.reserve_cache.snapshot(pair.address)
+            reserve_token = Web3.to_wei(pair.reserve_token, 'ether')
+            reserve_eth = Web3.to_wei(pair.reserve_eth, 'ether')
+            self.reserve_cache.track(
+                pair.address,
+                pair.created_at,
+                reserve_token if pair.token_index == 0 else reserve_eth,
+                reserve_eth if pair.token_index == 0 else reserve_token,
+                block_number,
+            )
+            self.cached_addresses_changed = True
+
+        if block_hash is not None:
+            self.block_records.append(BlockRecord(
+                block_number=block_number,
+                block_hash=normalize_hash(block_hash),
+                parent_hash=normalize_hash(parent_hash),
+                reserve_deltas=self.reserve_deltas,
+                cache_deltas=self.cache_deltas,
+            ))
+        self.reserve_deltas = {}
+        self.cache_deltas = {}
+
+    def filter_block(self, block_number, block_timestamp):
+        if INGESTION_MODE==constants.PER_CONTRACT_INGESTION_MODE:
+            return self.filter_log_in_block(block_number, block_timestamp)
+        if INGESTION_MODE==constants.RECEIPTS_INGESTION_MODE:
+            try:
+                return self.filter_receipts_in_block(block_number, block_timestamp)
+            except Exception as e:
+                logging.error(f"WATCHER receipts of block #{block_number} error {e}, fallback to log filters")
+        return self.filter_log_in_block_by_addresses(block_number, block_timestamp)
+
+    @timer_decorator
+    def handle_reorg(self, block_number, parent_hash):
+        parent_hash = normalize_hash(parent_hash)
+
+        if len(self.block_records)==0 or self.block_records[-1].block_number < block_number - 1:
+            return
+
+        if self.block_records[-1].block_number == block_number - 1 and self.block_records[-1].block_hash == parent_hash:
+            return
+
+        def rollback(record):
+            logging.warning(f"WATCHER rollback orphaned block #{record.block_number} {record.block_hash}")
+            for address, reserves in record.reserve_deltas.items():
+                pair = self.inventory.get(address)
+                if pair is not None:
+                    pair.reserve_token, pair.reserve_eth = reserves
+            for address, snapshot in record.cache_deltas.items():
+                self.reserve_cache.restore(address, snapshot)
+
+        # orphaned blocks at or above the new head
+        while len(self.block_records)>0 and self.block_records[-1].block_number >= block_number:
+            rollback(self.block_records.pop())
+
+        # walk back to the common ancestor collecting canonical headers
+        canonical = []
+        number = block_number - 1
+        expected_hash = parent_hash
+        while len(self.block_records)>0 and len(canonical) < REORG_BUFFER_DEPTH:
+            record = self.block_records[-1]
+            if record.block_number == number and record.block_hash == expected_hash:
+                break
+
+            header = self.w3.eth.get_block(number)
+            canonical.insert(0, header)
+            if record.block_number == number:
+                rollback(self.block_records.pop())
+
+            expected_hash = normalize_hash(header['parentHash'])
+            number -= 1
+
+        if len(self.block_records)==0:
+            logging.error(f"WATCHER reorg at #{block_number} is deeper than buffer depth {REORG_BUFFER_DEPTH}")
+
+        logging.warning(f"WATCHER reorg detected at #{block_number}, re-apply {len(canonical)} canonical blocks")
+
+        for header in canonical:
+            pairs = self.filter_block(header['number'], header['timestamp'])
+            self.publish_block(header['number'], header['timestamp'], header.get('baseFeePerGas', 0), header['gasUsed'], header['gasLimit'], pairs, header['hash'], header['parentHash'])
+
+    @timer_decorator
+    def backfill_gap(self, block_number):
+        if self.last_block_number == 0 or block_number <= self.last_block_number + 1:
+            return
+
+        from_block = self.last_block_number + 1
+        to_block = block_number - 1
+        if to_block - from_block + 1 > BACKFILL_MAX_GAP:
+            logging.warning(f"WATCHER gap of {to_block - from_block + 1} blocks exceeds max {BACKFILL_MAX_GAP}, skip blocks before #{to_block - BACKFILL_MAX_GAP + 1}")
+            from_block = to_block - BACKFILL_MAX_GAP + 1
+
+        logging.warning(f"WATCHER backfill missed blocks from #{from_block} to #{to_block}")
+
+        logs_by_block = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
+            future_to_range = {
+                executor.submit(self.get_logs_by_addresses, start, min(start + BACKFILL_CHUNK_SIZE - 1, to_block), [constants.PAIR_CREATED_TOPIC, constants.SYNC_TOPIC]): start
+                for start in range(from_block, to_block + 1, BACKFILL_CHUNK_SIZE)
+            }
+            for future in concurrent.futures.as_completed(future_to_range):
+                start = future_to_range[future]
+                try:
+                    for log in future.result():
+                        logs_by_block.setdefault(log['blockNumber'], []).append(log)
+                except Exception as e:
+                    logging.error(f"WATCHER backfill logs from #{start} error {e}")
+
+            # every header is recorded, so the hash chain stays intact for reorg detection
+            future_to_block = {executor.submit(self.w3.eth.get_block, number): number for number in range(from_block, to_block + 1)}
+            headers = {}
+            for future in concurrent.futures.as_completed(future_to_block):
+                number = future_to_block[future]
+                try:
+                    headers[number] = future.result()
+                except Exception as e:
+                    logging.error(f"WATCHER backfill block #{number} error {e}")
+
+        for number in sorted(headers.keys()):
+            header = headers[number]
+            if number not in logs_by_block:
+                self.block_records.append(BlockRecord(
+                    block_number=number,
+                    block_hash=normalize_hash(header['hash']),
+                    parent_hash=normalize_hash(header['parentHash']),
+                ))
                 continue
 
+            logs = sorted(logs_by_block[number], key=lambda log: log['logIndex'])
+
+            results = self.sort_logs(logs, header['timestamp'])
+
+            pairs = results[FilterLogsType.PAIR_CREATED].data
+            self.sync_reserves_and_creator(pairs, number)
+
+            for log in results[FilterLogsType.SYNC].data:
+                self.apply_sync(log)
+
+            logging.warning(f"WATCHER replay block #{number} pairs {len(pairs)} syncs {len(results[FilterLogsType.SYNC].data)}")
+
+            self.publish_block(number, header['timestamp'], header.get('baseFeePerGas', 0), header['gasUsed'], header['gasLimit'], pairs, header['hash'], header['parentHash'])
+
+        self.last_block_number = to_block
+
     async def listen_mempool(self):
         global glb_lock
         global glb_mempool_middleware_added
@@ -97,33 +482,57 @@ class BlockWatcher(metaclass=Singleton):
             try:
                 logging.warning(f"WATCHER websocket-mempool connected...")
 
-                subscription_id = await w3Async.eth.subscribe("newPendingTransactions")
-                print(f"subscription id {subscription_id}")
+                # full transaction objects save a getTransactionByHash round trip per pending hash
+                subscription_id = await w3Async.eth.subscribe("newPendingTransactions", True)
+                logging.info(f"WATCHER mempool subscription id {subscription_id}")
 
                 async for response in w3Async.ws.process_subscriptions():
-                    logging.info(f"new pending tx {Web3.to_hex(response['result'])}")
-                    self.trace_tx(Web3.to_hex(response['result']))
+                    pending_pair = self.decode_pending_tx(response['result'])
+                    if pending_pair is not None:
+                        logging.warning(f"WATCHER found {pending_pair}")
+                        self.push_pending_pair(pending_pair)
                     
             except websockets.ConnectionClosed:
                 logging.error(f"WATCHER websocket connection closed, reconnect...")
                 continue
 
-    def trace_tx(self, tx_hash)->None:
+    def decode_pending_tx(self, tx):
         try:
-            #result = self.w3.provider.make_request("trace_replayTransaction", [tx_hash,['stateDiff']])
-            #result = self.w3.provider.make_request("trace_replayTransaction", [tx_hash,['trace']])
-            result = self.w3.provider.make_request("eth_getTransactionByHash", [tx_hash])
-        
-            if result is not None and result.get('result') is not None and result['result']['blockNumber'] is None:
-                print(f"pending tx {result}")
-                if result is not None and result.get('result') is not None:
-                    #print(f"to {result['result']['to']}")
-                    if result['result']['to'].lower()=='0x60abdbe0bf85d5109dbeacbca80945a5d40dac55'.lower():
-                        print(f"urahh... {result}")
-                #raw_tx = create_signed_raw_transaction(self.w3, result['result'])
-                #print(f"signed raw transaction {raw_tx}")
+            if not isinstance(tx, Mapping) or tx.get('to') is None or tx['to'].lower() != self.router.address.lower():
+                return None
+
+            data = normalize_hash(tx['input'])
+            if not data.startswith(constants.ADD_LIQUIDITY_METHOD_ID):
+                return None
+
+            _, params = self.router.decode_function_input(data)
+            if params['token'].lower() == self.weth_address.lower():
+                return None
+
+            return PendingPair(
+                token=params['token'],
+                creator=tx['from'],
+                amount_token=Web3.from_wei(params['amountTokenDesired'], 'ether'),
+                amount_eth=Web3.from_wei(tx['value'], 'ether'),
+                tx_hash=normalize_hash(tx['hash']),
+                detected_at=int(time.time()),
+            )
         except Exception as e:
-            logging.error(f"WATCHER mempool error {e}")
+            logging.error(f"WATCHER decode pending tx error {e}")
+            return None
+
+    def push_pending_pair(self, pending_pair):
+        # drop the oldest candidate when the queue is full, fresh ones are more valuable
+        while True:
+            try:
+                self.mempool_broker.put_nowait(pending_pair)
+                return
+            except queue.Full:
+                try:
+                    dropped = self.mempool_broker.get_nowait()
+                    logging.warning(f"WATCHER mempool queue full, drop pending pair {dropped.token}")
+                except queue.Empty:
+                    pass
 
     @timer_decorator
     def get_reserves_and_creator(self, pair_address, block_number):
@@ -150,6 +559,284 @@ class BlockWatcher(metaclass=Singleton):
         reserves = contract.functions.getReserves().call()
         return reserves
     
+    def build_pair(self, log, block_timestamp):
+        logging.debug(f"WATCHER found pair created {log}")
+        if log['args']['token0'].lower() == self.weth_address.lower() or log['args']['token1'].lower() == self.weth_address.lower():
+            return Pair(
+                token=log['args']['token0'] if log['args']['token1'].lower() == self.weth_address.lower() else log['args']['token1'],
+                token_index=0 if log['args']['token1'].lower() == self.weth_address.lower() else 1,
+                address=log['args']['pair'],
+                created_at=block_timestamp,
+            )
+        return None
+
+    @timer_decorator
+    def batch_get_reserves_and_creator(self, pairs, block_number):
+        payloads = []
+        for idx,pair in enumerate(pairs):
+            payloads.append({
+                'jsonrpc': '2.0',
+                'id': 2*idx,
+                'method': 'eth_call',
+                'params': [{'to': pair.address, 'data': constants.GET_RESERVES_METHOD_ID}, hex(block_number)],
+            })
+            payloads.append({
+                'jsonrpc': '2.0',
+                'id': 2*idx+1,
+                'method': 'eth_getLogs',
+                'params': [{
+                    'fromBlock': hex(block_number),
+                    'toBlock': hex(block_number),
+                    'address': pair.address,
+                    'topics': [constants.TRANSFER_TOPIC],
+                }],
+            })
+
+        responses = make_batch_request(self.w3.provider.ranked_endpoints()[0], payloads)
+
+        results = []
+        for idx,pair in enumerate(pairs):
+            reserves = None
+            creator = None
+
+            try:
+                response = responses.get(2*idx)
+                if response is not None and response.get('result') is not None:
+                    reserves = decode_pair_reserves(Web3.to_bytes(hexstr=response['result']))
+                else:
+                    logging.error(f"WATCHER batch getReserves {pair.address} error {response}")
+
+                response = responses.get(2*idx+1)
+                if response is not None and response.get('result') is not None:
+                    for log in response['result']:
+                        to = '0x' + log['topics'][2][26:]
+                        if to != ADDRESS_ZERO:
+                            creator = to
+                            break
+                else:
+                    logging.error(f"WATCHER batch getLogs {pair.address} error {response}")
+            except Exception as e:
+                logging.error(f"WATCHER batch decode {pair.address} error {e}")
+
+            results.append((reserves, creator))
+
+        return results
+
+    def sync_reserves_and_creator(self, pairs, block_number):
+        def apply_reserves_and_creator(pair, result):
+            logging.debug(f"WATCHER getReserves {pair.address} result {result}")
+            if result[0] is not None and len(result[0])>1:
+                pair.reserve_token = Web3.from_wei(result[0][0],'ether') if pair.token_index == 0 else Web3.from_wei(result[0][1], 'ether')
+                pair.reserve_eth = Web3.from_wei(result[0][1],'ether') if pair.token_index == 0 else Web3.from_wei(result[0][0], 'ether')
+            
+            if result[1] is not None:
+                pair.creator = Web3.to_checksum_address(result[1])
+
+        if len(pairs)==0:
+            return
+
+        if BATCH_RPC_REQUESTS==1:
+            try:
+                for pair, result in zip(pairs, self.batch_get_reserves_and_creator(pairs, block_number)):
+                    apply_reserves_and_creator(pair, result)
+                return
+            except Exception as e:
+                logging.error(f"WATCHER batch getReserves error {e}, fallback to concurrent requests")
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
+            future_to_pair = {executor.submit(self.get_reserves_and_creator, pair.address, block_number): idx for idx,pair in enumerate(pairs)}
+            for future in concurrent.futures.as_completed(future_to_pair):
+                idx = future_to_pair[future]
+                try:
+                    apply_reserves_and_creator(pairs[idx], future.result())
+                except Exception as e:
+                    logging.error(f"WATCHER getReserves {pairs[idx].address} error {e}")
+
+    def update_inventory_reserves(self, pair_address, log):
+        pair = self.inventory.get(pair_address)
+        if pair is not None:
+            logging.debug(f"WATCHER update reserves for inventory pair {pair.address}")
+            if pair.address.lower() not in self.reserve_deltas:
+                self.reserve_deltas[pair.address.lower()] = (pair.reserve_token, pair.reserve_eth)
+
+            pair.reserve_token = Web3.from_wei(log['args']['reserve0'], 'ether') if pair.token_index==0 else Web3.from_wei(log['args']['reserve1'], 'ether')
+            pair.reserve_eth = Web3.from_wei(log['args']['reserve1'], 'ether') if pair.token_index==0 else Web3.from_wei(log['args']['reserve0'], 'ether')
+
+    def apply_sync(self, log):
+        block_number = log['blockNumber'] if isinstance(log['blockNumber'], int) else int(log['blockNumber'], 16)
+        if log['address'].lower() not in self.cache_deltas:
+            snapshot = self.reserve_cache.snapshot(log['address'])
+            if snapshot is not None:
+                self.cache_deltas[log['address'].lower()] = snapshot
+        self.reserve_cache.update(log['address'], log['args']['reserve0'], log['args']['reserve1'], block_number)
+        self.update_inventory_reserves(log['address'], log)
+
+    def get_sync_addresses(self):
+        # called from the fetch threads while reports add and remove inventory pairs on the loop
+        with glb_lock:
+            inventory_addresses = self.inventory.addresses()
+
+        addresses = [Web3.to_checksum_address(address) for address in inventory_addresses]
+        return addresses + [Web3.to_checksum_address(address) for address in self.reserve_cache.addresses() if Web3.to_checksum_address(address) not in addresses]
+
+    def split_addresses(self, addresses):
+        # providers reject or crawl on filters with thousands of addresses
+        return [addresses[idx:idx+SYNC_FILTER_MAX_ADDRESSES] for idx in range(0, len(addresses), SYNC_FILTER_MAX_ADDRESSES)]
+
+    def get_logs_by_addresses(self, from_block, to_block, topics):
+        chunks = self.split_addresses([self.factory.address] + self.get_sync_addresses())
+
+        def get_logs(addresses):
+            return self.w3.eth.get_logs({
+                'fromBlock': from_block,
+                'toBlock': to_block,
+                'address': addresses,
+                'topics': [topics],
+            })
+
+        if len(chunks)==1:
+            return get_logs(chunks[0])
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+            logs = [log for chunk_logs in executor.map(get_logs, chunks) for log in chunk_logs]
+        # syncs of one pair are applied in chain order
+        return sorted(logs, key=lambda log: (log['blockNumber'], log['logIndex']))
+
+    @timer_decorator
+    def filter_log_in_block_by_addresses(self, block_number, block_timestamp):
+        logs = self.get_logs_by_addresses(block_number, block_number, [constants.PAIR_CREATED_TOPIC, constants.SYNC_TOPIC, constants.SWAP_TOPIC])
+        return self.apply_logs(logs, block_number, block_timestamp)
+
+    def apply_logs(self, logs, block_number, block_timestamp):
+        results = self.sort_logs(logs, block_timestamp)
+
+        pairs = results[FilterLogsType.PAIR_CREATED].data
+        self.sync_reserves_and_creator(pairs, block_number)
+
+        for log in results[FilterLogsType.SYNC].data:
+            logging.debug(f"sync {log}")
+            self.apply_sync(log)
+
+        logging.debug(f"WATCHER found {len(results[FilterLogsType.SWAP].data)} swaps of inventory pairs")
+
+        return pairs
+
+    @timer_decorator
+    def get_block_receipts(self, block_number):
+        if self.block_receipts_supported:
+            response = self.w3.provider.make_request('eth_getBlockReceipts', [hex(block_number)])
+            if response.get('result') is not None:
+                return response['result']
+
+            logging.warning(f"WATCHER eth_getBlockReceipts unsupported {response.get('error')}, fallback to batch receipts")
+            self.block_receipts_supported = False
+
+        block = self.w3.eth.get_block(block_number)
+        if len(block['transactions'])==0:
+            return []
+
+        payloads = [{
+            'jsonrpc': '2.0',
+            'id': idx,
+            'method': 'eth_getTransactionReceipt',
+            'params': [normalize_hash(tx_hash)],
+        } for idx,tx_hash in enumerate(block['transactions'])]
+
+        responses = make_batch_request(self.w3.provider.ranked_endpoints()[0], payloads)
+
+        receipts = []
+        for idx in range(len(payloads)):
+            response = responses.get(idx)
+            if response is None or response.get('result') is None:
+                raise Exception(f"missing receipt of tx {payloads[idx]['params'][0]} {response}")
+            receipts.append(response['result'])
+
+        return receipts
+
+    @timer_decorator
+    def filter_receipts_in_block(self, block_number, block_timestamp):
+        logs = [log for receipt in self.get_block_receipts(block_number) for log in receipt['logs']]
+        return self.apply_receipt_logs(logs, block_timestamp)
+
+    def apply_receipt_logs(self, logs, block_timestamp):
+        pairs = {}
+        for log in logs:
+            if log['address'].lower() == self.factory.address.lower() and normalize_hash(log['topics'][0]) == constants.PAIR_CREATED_TOPIC:
+                pair = self.build_pair(self.factory.events.PairCreated().process_log(log), block_timestamp)
+                if pair is not None:
+                    pairs[pair.address.lower()] = pair
+
+        cached_addresses = set([address.lower() for address in self.reserve_cache.addresses()])
+
+        # single pass, decoding only logs of the pairs we care about
+        for log in logs:
+            address = log['address'].lower()
+            if address not in pairs and address not in self.inventory and address not in self.mm_tracked_pairs and address not in cached_addresses:
+                continue
+
+            try:
+                topic = normalize_hash(log['topics'][0])
+                if topic == constants.SYNC_TOPIC:
+                    sync = self.pair_contract.events.Sync().process_log(log)
+                    if address in pairs:
+                        # the last Sync of the block carries the closing reserves
+                        pair = pairs[address]
+                        pair.reserve_token = Web3.from_wei(sync['args']['reserve0'],'ether') if pair.token_index == 0 else Web3.from_wei(sync['args']['reserve1'], 'ether')
+                        pair.reserve_eth = Web3.from_wei(sync['args']['reserve1'],'ether') if pair.token_index == 0 else Web3.from_wei(sync['args']['reserve0'], 'ether')
+                    self.apply_sync(sync)
+                elif topic == constants.TRANSFER_TOPIC and address in pairs:
+                    # the first mint to a non-zero address goes to the liquidity provider
+                    transfer = self.pair_contract.events.Transfer().process_log(log)
+                    if pairs[address].creator is None and transfer['args']['from'] == ADDRESS_ZERO and transfer['args']['to'] != ADDRESS_ZERO:
+                        pairs[address].creator = Web3.to_checksum_address(transfer['args']['to'])
+                elif topic == constants.SWAP_TOPIC and address in self.mm_tracked_pairs:
+                    swap = self.pair_contract.events.Swap().process_log(log)
+                    pair = self.mm_tracked_pairs[address]
+                    if (Web3.from_wei(swap['args']['amount0In'], 'ether')>constants.MM_TX_AMOUNT_THRESHOLD and pair.token_index==1) or (Web3.from_wei(swap['args']['amount1In'], 'ether')>constants.MM_TX_AMOUNT_THRESHOLD and pair.token_index==0):
+                        pair.number_tx_mm += 1
+                        if pair not in self.watchlist_updates:
+                            self.watchlist_updates.append(pair)
+            except Exception as e:
+                logging.error(f"WATCHER decode receipt log {log} error {e}")
+
+        # swaps are counted from the block after creation on, like the inspector does
+        for address, pair in pairs.items():
+            self.mm_tracked_pairs[address] = Pair(
+                token=pair.token,
+                token_index=pair.token_index,
+                address=pair.address,
+                created_at=pair.created_at,
+            )
+            while len(self.mm_tracked_pairs) > MM_TRACKED_PAIRS_CAPACITY:
+                self.mm_tracked_pairs.popitem(last=False)
+
+        logging.debug(f"WATCHER decoded {len(logs)} receipt logs, found {len(pairs)} pairs, {len(self.watchlist_updates)} watchlist updates")
+
+        return list(pairs.values())
+
+    def sort_logs(self, logs, block_timestamp):
+        results = {
+            FilterLogsType.PAIR_CREATED: FilterLogs(type=FilterLogsType.PAIR_CREATED, data=[]),
+            FilterLogsType.SYNC: FilterLogs(type=FilterLogsType.SYNC, data=[]),
+            FilterLogsType.SWAP: FilterLogs(type=FilterLogsType.SWAP, data=[]),
+        }
+
+        for log in logs:
+            try:
+                topic = normalize_hash(log['topics'][0])
+                if topic == constants.PAIR_CREATED_TOPIC and log['address'].lower() == self.factory.address.lower():
+                    pair = self.build_pair(self.factory.events.PairCreated().process_log(log), block_timestamp)
+                    if pair is not None:
+                        results[FilterLogsType.PAIR_CREATED].data.append(pair)
+                elif topic == constants.SYNC_TOPIC:
+                    results[FilterLogsType.SYNC].data.append(self.pair_contract.events.Sync().process_log(log))
+                elif topic == constants.SWAP_TOPIC:
+                    results[FilterLogsType.SWAP].data.append(self.pair_contract.events.Swap().process_log(log))
+            except Exception as e:
+                logging.error(f"WATCHER decode log {log} error {e}")
+
+        return results
+
     @timer_decorator
     def filter_log_in_block(self, block_number, block_timestamp):
         #block_number = 41327949 # TODO
@@ -163,30 +850,11 @@ class BlockWatcher(metaclass=Singleton):
             pairs = []
             if pair_created_logs != ():
                 for log in pair_created_logs:
-                    logging.debug(f"WATCHER found pair created {log}")
-                    if log['args']['token0'].lower() == self.weth_address.lower() or log['args']['token1'].lower() == self.weth_address.lower():
-                        pairs.append(Pair(
-                            token=log['args']['token0'] if log['args']['token1'].lower() == self.weth_address.lower() else log['args']['token1'],
-                            token_index=0 if log['args']['token1'].lower() == self.weth_address.lower() else 1,
-                            address=log['args']['pair'],
-                            created_at=block_timestamp,
-                        ))
-
-            with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-                future_to_pair = {executor.submit(self.get_reserves_and_creator, pair.address, block_number): idx for idx,pair in enumerate(pairs)}
-                for future in concurrent.futures.as_completed(future_to_pair):
-                    idx = future_to_pair[future]
-                    try:
-                        result = future.result()
-                        logging.debug(f"WATCHER getReserves {pairs[idx].address} result {result}")
-                        if result[0] is not None and len(result[0])>1:
-                            pairs[idx].reserve_token = Web3.from_wei(result[0][0],'ether') if pairs[idx].token_index == 0 else Web3.from_wei(result[0][1], 'ether')
-                            pairs[idx].reserve_eth = Web3.from_wei(result[0][1],'ether') if pairs[idx].token_index == 0 else Web3.from_wei(result[0][0], 'ether')
-                        
-                        if result[1] is not None:
-                            pairs[idx].creator = Web3.to_checksum_address(result[1])
-                    except Exception as e:
-                        logging.error(f"WATCHER getReserves {pairs[idx].address} error {e}")
+                    pair = self.build_pair(log, block_timestamp)
+                    if pair is not None:
+                        pairs.append(pair)
+
+            self.sync_reserves_and_creator(pairs, block_number)
 
             return FilterLogs(
                 type=FilterLogsType.PAIR_CREATED,
@@ -241,12 +909,7 @@ class BlockWatcher(metaclass=Singleton):
                             if result.data != ():
                                 for log in result.data:
                                     logging.debug(f"sync {log}")
-
-                                    for pair in self.inventory:
-                                        if pair.address == contract:
-                                            logging.debug(f"WATCHER update reserves for inventory pair {pair.address}")
-                                            pair.reserve_token = Web3.from_wei(log['args']['reserve0'], 'ether') if pair.token_index==0 else Web3.from_wei(log['args']['reserve1'], 'ether')
-                                            pair.reserve_eth = Web3.from_wei(log['args']['reserve1'], 'ether') if pair.token_index==0 else Web3.from_wei(log['args']['reserve0'], 'ether')
+                                    self.update_inventory_reserves(contract, log)
 
                 except Exception as e:
                     logging.error(f"WATCHER pair {contract} error {e}")
@@ -258,22 +921,27 @@ class BlockWatcher(metaclass=Singleton):
 
         def add_pair_to_inventory(pair):
             # sync current reserves
-            result = self.get_reserves(pair.address)
+            state = self.reserve_cache.get(pair.address)
+            if state is not None:
+                result = (state.reserve0, state.reserve1)
+            else:
+                result = self.get_reserves(pair.address)
             logging.debug(f"WATCHER get reserves {pair.address} result {result}")
 
             pair.reserve_token = Web3.from_wei(result[0],'ether') if pair.token_index == 0 else Web3.from_wei(result[1], 'ether')
             pair.reserve_eth = Web3.from_wei(result[1],'ether') if pair.token_index == 0 else Web3.from_wei(result[0], 'ether')
 
             with glb_lock:
-                self.inventory.append(pair)
+                self.inventory.add(pair)
+                self.sync_addresses_changed = True
             logging.warning(f"WATCHER add pair {pair.address} to inventory length {len(self.inventory)}")
 
         def remove_pair_from_inventory(pair):
-            for idx,pr in enumerate(self.inventory):
-                if pr.address == pair.address:
-                    with glb_lock:
-                        self.inventory.pop(idx)
-                        logging.warning(f"WATCHER remove pair {pair.address} from inventory length {len(self.inventory)}")
+            if pair.address in self.inventory:
+                with glb_lock:
+                    self.inventory.remove(pair.address)
+                    self.sync_addresses_changed = True
+                    logging.warning(f"WATCHER remove pair {pair.address} from inventory length {len(self.inventory)}")
 
         while True:
             report = await self.report_broker.coro_get()
@@ -282,7 +950,7 @@ class BlockWatcher(metaclass=Singleton):
                 try:
                     logging.info(f"WATCHER receive report {report}")
                     if report.is_buy and report.tx_status == TxStatus.SUCCESS:
-                        if report.pair.address not in [pair.address for pair in self.inventory]:
+                        if report.pair.address not in self.inventory:
                             add_pair_to_inventory(report.pair)
                     else:
                         remove_pair_from_inventory(report.pair)
@@ -291,11 +959,17 @@ class BlockWatcher(metaclass=Singleton):
 
     
     async def main(self):
-        await asyncio.gather(
-            self.listen_block(),
-            self.listen_report(),
-            #self.listen_mempool(),
-        )
+        if MEMPOOL_ENABLED==1 and self.mempool_broker is not None and self.router is not None:
+            await asyncio.gather(
+                self.listen_block(),
+                self.listen_report(),
+                self.listen_mempool(),
+            )
+        else:
+            await asyncio.gather(
+                self.listen_block(),
+                self.listen_report(),
+            )
 
 if __name__ == "__main__":     
     from dotenv import load_dotenv